@@ -1,32 +1,50 @@
 import os
+import time
 from openai import OpenAI
 from dotenv import load_dotenv
+from metrics import observe, observe_output_tokens
+from query_router import route_query, MODE_DIRECT, MODE_REACT
 
 load_dotenv()
 
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
+# Any OpenAI-compatible endpoint; point it at mock_llm_server.py for load tests
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", "https://openrouter.ai/api/v1")
 
 if not OPENROUTER_API_KEY:
     print("WARNING: OPENROUTER_API_KEY not found in environment variables in ai.py.")
     print("Please ensure your .env file is correctly configured and loaded.")
 
 llm_client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
+    base_url=LLM_BASE_URL,
     api_key=OPENROUTER_API_KEY,
 )
 
-def get_ai_response(user_query: str) -> str:
+# Completion budgets per response mode (the ReAct sections are generated and then discarded)
+MAX_TOKENS_BY_MODE = {
+    MODE_DIRECT: 300,
+    MODE_REACT: 600,
+}
+
+def build_direct_prompt(user_query: str) -> str:
     """
-    Generates an AI response using a 'React-style' prompt engineering technique,
-    where the LLM performs internal reasoning before producing the final answer.
-    RAG functionality is completely removed.
+    Prompt for simple/FAQ queries: answer straight away, without reasoning sections.
     """
-    print(f"\n--- Agentic (React-Style) Process Started for query: '{user_query}' ---")
+    return f"""
+    Your name is Kara , a Representative , helpful and informative AI assistant for Curate.Fun.
+    You only have access to your general knowledge. There is no external knowledge base (RAG) or Internet Web Search available.
+    Answer the user's question directly in a few concise, helpful sentences. Do not describe your reasoning.
+    If the question could only be answered from a specific knowledge base or recent news, politely say you cannot provide that information.
 
+    User's question: {user_query}
+    """
 
-    # --- React-Style Prompting ---
-    # The prompt guides the LLM to think step-by-step
-    prompt_content = f"""
+def build_react_prompt(user_query: str) -> str:
+    """
+    React-Style Prompting: the prompt guides the LLM to think step-by-step
+    before the "Final Answer:" section that is shown to the user.
+    """
+    return f"""
     Your name is Kara , a Representative , helpful and informative AI assistant for Curate.Fun.
     Your task is to answer the user's question. Follow a structured thought process to derive your final answer.
     You only have access to your general knowledge. There is no external knowledge base (RAG) or Internet Web Search available.
@@ -46,12 +64,29 @@ def get_ai_response(user_query: str) -> str:
 
     """
 
+def get_ai_response(user_query: str) -> str:
+    """
+    Generates an AI response. query_router picks the mode: simple/FAQ queries get a
+    direct-answer prompt, complex ones a 'React-style' prompt where the LLM performs
+    internal reasoning before producing the final answer.
+    RAG functionality is completely removed.
+    """
+    mode, reason = route_query(user_query)
+    print(f"\n--- Agentic Process Started in '{mode}' mode ({reason}) for query: '{user_query}' ---")
+
+    if mode == MODE_DIRECT:
+        prompt_content = build_direct_prompt(user_query)
+    else:
+        prompt_content = build_react_prompt(user_query)
+
     try:
-        print("Sending React-style prompt to LLM for reasoning and answer generation...")
-        completion = llm_client.chat.completions.create(
+        print(f"Sending {mode} prompt to LLM for answer generation...")
+        llm_start = time.perf_counter()
+        # Stream the completion so time-to-first-token can be measured separately from total time
+        stream = llm_client.chat.completions.create(
             extra_headers={
                 "HTTP-Referer": "http://localhost:3000",
-                "X-Title": "Curate.Fun Agentic (React-Style) Chatbot",
+                "X-Title": "Curate.Fun Agentic Chatbot", # Same app name for both response modes
             },
             extra_body={},
             model="deepseek/deepseek-chat-v3-0324:free", # Your chosen LLM
@@ -62,10 +97,28 @@ def get_ai_response(user_query: str) -> str:
                 }
             ],
             temperature=0.6, # Keep low for structured reasoning
-            max_tokens=600 # Limit the response length
+            max_tokens=MAX_TOKENS_BY_MODE[mode], # Limit the response length
+            stream=True,
+            stream_options={"include_usage": True} # Final chunk reports completion_tokens
         )
 
-        ai_response_content = completion.choices[0].message.content
+        response_parts = []
+        completion_tokens = None
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                completion_tokens = chunk.usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not response_parts:
+                    observe("llm_ttft", time.perf_counter() - llm_start)
+                response_parts.append(delta)
+        observe("llm_total", time.perf_counter() - llm_start)
+        # Providers that don't report usage stream roughly one token per chunk
+        observe_output_tokens(mode, completion_tokens if completion_tokens is not None else len(response_parts))
+
+        ai_response_content = "".join(response_parts)
         print(f"Received AI response:\n{ai_response_content}")
         
         # Extract the "Final Answer" part if the LLM followed the structure
@@ -81,4 +134,4 @@ def get_ai_response(user_query: str) -> str:
 
     except Exception as e:
         print(f"Error calling OpenRouter API: {e}")
-        return "I'm sorry, I couldn't get a response from the AI at the moment. Please try again later."
\ No newline at end of file
+        return "I'm sorry, I couldn't get a response from the AI at the moment. Please try again later."
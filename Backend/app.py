@@ -1,9 +1,10 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response
 from flask_socketio import SocketIO, emit, send
 from flask_cors import CORS # Import CORS
 from openai import OpenAI
 import os
 from ai import get_ai_response
+from metrics import start_trace, end_trace, timed_stage, render_prometheus
 import datetime # For status timestamps
 import random   # For simulating process
 import time     # For simulating process
@@ -13,20 +14,55 @@ app = Flask(__name__)
 
 CORS(app) 
 
-socketio = SocketIO(app, cors_allowed_origins="http://localhost:3000")
+# With several server workers (serve.py), Socket.IO broadcasts must go through a shared message queue, e.g. redis://localhost:6379
+socketio = SocketIO(app, cors_allowed_origins="http://localhost:3000", message_queue=os.environ.get("SOCKETIO_MESSAGE_QUEUE"))
+
+# Opt-in: load and warm up the RAG retrievers before serving (RAG_PRELOAD=1).
+# Off by default because the chat path (ai.get_ai_response) doesn't retrieve yet.
+RAG_PRELOAD = os.environ.get("RAG_PRELOAD", "0") == "1"
+_startup_complete = threading.Event()
+
+def prepare_for_serving():
+    """
+    Runs the explicit warmup step. serve.py calls this in the master process so
+    forked workers inherit the loaded model and indexes; `python app.py` calls it
+    before starting the development server.
+    """
+    if RAG_PRELOAD:
+        import rag # Imported here so plain `import app` stays light
+        try:
+            rag.warmup()
+        except Exception as e: # Missing indexes or packages must not keep /ready from coming up
+            print(f"⚠️ Warning: RAG warmup failed, serving without preloaded retrievers. Details: {e}")
+    _startup_complete.set()
 
 # Serve the React frontend (if needed)
 @app.route('/')
 def index():
     return "Backend is Running"
 
+# Prometheus scrape endpoint with per-stage latency histograms
+@app.route('/metrics')
+def metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+# Readiness probe: 503 until prepare_for_serving() has finished
+@app.route('/ready')
+def ready():
+    if not _startup_complete.is_set():
+        return jsonify({"ready": False}), 503
+    import rag
+    return jsonify({"ready": True, "retrievers_loaded": rag.is_ready()})
+
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
+# Any OpenAI-compatible endpoint; point it at mock_llm_server.py for load tests
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", "https://openrouter.ai/api/v1")
 
 if not OPENROUTER_API_KEY:
     print("WARNING: OPENROUTER_API_KEY not found in environment variables. Please check your .env file.")
 
 client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
+    base_url=LLM_BASE_URL,
     api_key=OPENROUTER_API_KEY,
 )
 
@@ -34,28 +70,34 @@ client = OpenAI(
 # --- Existing SocketIO handlers ---
 @socketio.on('chatMessage')
 def handle_message(message):
-    user_text = message.get('text')
-    sender = message.get('sender')
-
-    print(f"Received message from {sender}: {user_text}")
-
-    # First, echo the user's message back to all clients so they see their own message
-    emit('message', {'text': user_text, 'sender': 'user'}, broadcast=True)
-
-    if user_text:
-        try:
-            # --- MODIFIED: Call the get_ai_response function from ai.py ---
-            ai_response_content = get_ai_response(user_text)
-            print(f"AI Response: {ai_response_content}")
-
-            # Send the AI's response back to all clients
-            emit('message', {'text': ai_response_content, 'sender': 'ai'}, broadcast=True)
-
-        except Exception as e:
-            print(f"An unexpected error occurred in app.py handle_message: {e}")
-            emit('message', {'text': "An internal server error occurred.", 'sender': 'ai'}, broadcast=True)
-    else:
-        print("Received empty message from user.")
+    trace_id = start_trace()
+    try:
+        with timed_stage("socketio_receive"):
+            user_text = message.get('text')
+            sender = message.get('sender')
+
+            print(f"[trace {trace_id}] Received message from {sender}: {user_text}")
+
+            # First, echo the user's message back to all clients so they see their own message
+            emit('message', {'text': user_text, 'sender': 'user', 'traceId': trace_id}, broadcast=True)
+
+        if user_text:
+            try:
+                # --- MODIFIED: Call the get_ai_response function from ai.py ---
+                ai_response_content = get_ai_response(user_text)
+                print(f"AI Response: {ai_response_content}")
+
+                # Send the AI's response back to all clients
+                with timed_stage("emit"):
+                    emit('message', {'text': ai_response_content, 'sender': 'ai', 'traceId': trace_id}, broadcast=True)
+
+            except Exception as e:
+                print(f"An unexpected error occurred in app.py handle_message: {e}")
+                emit('message', {'text': "An internal server error occurred.", 'sender': 'ai', 'traceId': trace_id}, broadcast=True)
+        else:
+            print("Received empty message from user.")
+    finally:
+        end_trace()
 
 @socketio.on('ai_reaction')
 def handle_ai_reaction(data):
@@ -65,4 +107,7 @@ def handle_ai_reaction(data):
     print(f"Received AI reaction: Message Index {message_index}, Reaction: {reaction_type}")
 
 if __name__ == '__main__':
+    # debug=True starts a file-watching reloader parent that never serves; only warm up the serving child
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        prepare_for_serving()
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
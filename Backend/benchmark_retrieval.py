@@ -0,0 +1,277 @@
+import os
+import re
+import json
+import time
+import random
+import zlib
+import itertools
+import argparse
+import datetime
+import tempfile
+from email.utils import format_datetime
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from rank_bm25 import BM25Okapi
+
+from k_base import load_data_into_documents
+from rag import RetrieverManager, semantic_search, lexical_search, reciprocal_rank_fusion, deduplicate_chunks, QUERY_TIME_NEAR_DEDUP, K_RETRIEVAL, K_FINAL_CONTEXT, RRF_K_CONSTANT
+from context_builder import build_article_passages, build_context
+from metadata_index import MetadataIndex
+from lexical_tokenizer import LexicalTokenizer
+from feeds_new import urls
+
+try:
+    import resource # Unix only; memory is reported as None elsewhere
+except ImportError:
+    resource = None
+
+# Configuration Constants for the benchmark
+DEFAULT_CORPUS_SIZES = [10_000]
+DEFAULT_NUM_QUERIES = 200
+STRATEGIES = ["semantic", "lexical", "hybrid"]
+RESULTS_DIR = "bench_results"
+HASHING_EMBEDDING_DIMENSION = 256
+
+CHANNELS = [re.match(r"https://([a-z0-9]+)-rss", url).group(1).capitalize() for url in urls]
+TOPIC_WORDS = {
+    channel: [f"{channel.lower()}{suffix}" for suffix in ("", "dao", "chain", "labs", "fund", "token", "core", "devs")]
+    for channel in CHANNELS
+}
+CATEGORIES = ["news", "defi", "nft", "grants", "governance", "security", "research", "events", "funding", "infrastructure"]
+FILLER_VOCABULARY_SIZE = 20_000
+
+# --- Offline stand-in for the embedding model ---
+class HashingEmbeddings(Embeddings):
+    """
+    Tiny, deterministic bag-of-words embedding (signed feature hashing) so the
+    benchmark runs offline without downloading mxbai-embed-large-v1.
+    """
+    def __init__(self, dimension=HASHING_EMBEDDING_DIMENSION):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            bucket = zlib.crc32(token.encode("utf-8"))
+            vector[bucket % self.dimension] += 1.0 if bucket & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+# --- Synthetic corpus generator ---
+def generate_synthetic_articles(num_articles, seed=42):
+    """
+    Generates articles shaped like the feeds_new.py output: channel_title, title,
+    link, guid, publication_date (RFC 822), description and comma-separated categories.
+    Filler words follow a Zipf-like distribution so BM25 sees realistic term statistics.
+    """
+    rng = random.Random(seed)
+    filler = [f"w{i}" for i in range(FILLER_VOCABULARY_SIZE)]
+    # Cumulative weights computed once; passing weights= would re-accumulate all 20k entries on every draw
+    filler_cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(FILLER_VOCABULARY_SIZE)))
+    start = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+    articles = []
+    for i in range(num_articles):
+        channel = rng.choice(CHANNELS)
+        topic = TOPIC_WORDS[channel]
+        title_words = rng.sample(topic, 2) + rng.choices(filler, cum_weights=filler_cum_weights, k=4)
+        sentences = []
+        for _ in range(rng.randint(3, 12)):
+            words = rng.choices(filler, cum_weights=filler_cum_weights, k=rng.randint(8, 20)) + rng.sample(topic, 1)
+            rng.shuffle(words)
+            sentences.append(" ".join(words).capitalize() + ".")
+        link = f"https://example.com/{channel.lower()}/{i}"
+        articles.append({
+            "channel_title": channel,
+            "title": " ".join(title_words).title(),
+            "link": link,
+            "guid": link,
+            "publication_date": format_datetime(start + datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 180)), usegmt=True),
+            "description": " ".join(sentences),
+            "categories": ", ".join(rng.sample(CATEGORIES, rng.randint(1, 3))),
+        })
+    return articles
+
+def generate_queries(articles, num_queries, seed=7):
+    """
+    Builds queries from random articles' titles plus a couple of description words,
+    so every query has at least one clearly relevant article.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for article in rng.sample(articles, min(num_queries, len(articles))):
+        description_words = article["description"].rstrip(".").split()
+        queries.append(" ".join(article["title"].lower().split()[:3] + rng.sample(description_words, 2)))
+    return queries
+
+# --- Measurement helpers ---
+def percentiles_ms(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.array(samples) * 1000.0, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+def max_rss_mib():
+    """
+    Peak resident set size of this process (includes FAISS/numpy native memory).
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return round(max_rss / (2**20 if os.uname().sysname == "Darwin" else 2**10), 1)
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def exact_semantic_top_k(query, embeddings_model, corpus_matrix, k):
+    query_vector = np.array(embeddings_model.embed_query(query), dtype=np.float32)
+    distances = np.sum((corpus_matrix - query_vector) ** 2, axis=1)
+    return set(np.argpartition(distances, min(k, len(distances) - 1))[:k].tolist())
+
+def doc_positions(docs_with_scores, position_by_guid):
+    return {position_by_guid[doc.metadata["guid"]] for doc, _ in docs_with_scores}
+
+# --- Benchmark stages ---
+def build_indexes(corpus_size, seed, verbose=True):
+    """
+    Generates a corpus of `corpus_size` articles and builds every index k_base builds,
+    timing each build stage and recording peak process memory.
+    """
+    build_times = {}
+
+    articles, build_times["generate_corpus"] = timed(generate_synthetic_articles, corpus_size, seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "all_new_articles.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(articles, f)
+        all_docs, build_times["load_documents"] = timed(load_data_into_documents, json_path)
+
+    embeddings_model = HashingEmbeddings()
+    faiss_db, build_times["faiss"] = timed(FAISS.from_documents, all_docs, embeddings_model)
+    lexical_tokenizer = LexicalTokenizer()
+    tokenized_corpus, build_times["bm25_tokenize"] = timed(lexical_tokenizer.encode_corpus, [doc.page_content for doc in all_docs])
+    bm25_index, build_times["bm25_index"] = timed(BM25Okapi, tokenized_corpus)
+    passages_by_article, build_times["passages"] = timed(build_article_passages, all_docs)
+    metadata_index, build_times["metadata_index"] = timed(MetadataIndex.from_documents, all_docs)
+
+    peak_rss = max_rss_mib()
+    if verbose:
+        print(f"  Built indexes for {corpus_size} articles in {sum(build_times.values()):.1f}s (peak RSS {peak_rss} MiB).")
+
+    manager = RetrieverManager(faiss_db, bm25_index, lexical_tokenizer, all_docs, embeddings_model, passages_by_article, metadata_index)
+    build_report = {
+        "seconds": {stage: round(seconds, 3) for stage, seconds in build_times.items()},
+        "peak_rss_mib": peak_rss,
+    }
+    return manager, articles, build_report
+
+def run_queries(manager, queries, strategy, corpus_matrix, position_by_guid):
+    """
+    Replays the query set for one strategy, timing each retrieval stage separately
+    and measuring the overlap of its top K_RETRIEVAL with the exact (brute-force)
+    semantic top K_RETRIEVAL. This is not recall against relevance judgements: the
+    FAISS store is a flat (exact) index, so "semantic" overlaps 1.0 by construction,
+    and for lexical/hybrid it shows how far they diverge from pure semantic ranking.
+    """
+    stage_samples = {"semantic": [], "lexical": [], "rrf": [], "dedup": [], "context": [], "total": []}
+    overlaps = []
+    for query in queries:
+        query_start = time.perf_counter()
+        if strategy in ("semantic", "hybrid"):
+            semantic_ranked, elapsed = timed(semantic_search, query, manager)
+            stage_samples["semantic"].append(elapsed)
+            ranked = semantic_ranked
+        if strategy in ("lexical", "hybrid"):
+            lexical_ranked, elapsed = timed(lexical_search, query, manager)
+            stage_samples["lexical"].append(elapsed)
+            ranked = lexical_ranked
+        if strategy == "hybrid":
+            ranked, elapsed = timed(reciprocal_rank_fusion, [semantic_ranked, lexical_ranked], k=RRF_K_CONSTANT)
+            stage_samples["rrf"].append(elapsed)
+        deduplicated, elapsed = timed(deduplicate_chunks, ranked, manager.embeddings_model, similarity_threshold=0.98, near_duplicates=QUERY_TIME_NEAR_DEDUP)
+        stage_samples["dedup"].append(elapsed)
+        _, elapsed = timed(build_context, query, deduplicated[:K_FINAL_CONTEXT], manager.passages_by_article)
+        stage_samples["context"].append(elapsed)
+        stage_samples["total"].append(time.perf_counter() - query_start)
+
+        exact = exact_semantic_top_k(query, manager.embeddings_model, corpus_matrix, K_RETRIEVAL)
+        overlaps.append(len(doc_positions(ranked[:K_RETRIEVAL], position_by_guid) & exact) / len(exact))
+
+    return {
+        "latency_ms": {stage: percentiles_ms(samples) for stage, samples in stage_samples.items() if samples},
+        "semantic_overlap_at_k": round(float(np.mean(overlaps)), 4),
+        "k": K_RETRIEVAL,
+    }
+
+def run_benchmark(corpus_sizes, num_queries, strategies, seed=42, verbose=True):
+    results = {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "runs": []}
+    for corpus_size in corpus_sizes:
+        if verbose:
+            print(f"\n--- Corpus size: {corpus_size} articles ---")
+        manager, articles, build_report = build_indexes(corpus_size, seed, verbose)
+        queries = generate_queries(articles, num_queries)
+        corpus_matrix = manager.faiss_db.index.reconstruct_n(0, manager.faiss_db.index.ntotal)
+        position_by_guid = {doc.metadata["guid"]: position for position, doc in enumerate(manager.all_docs)}
+
+        run = {"corpus_size": corpus_size, "num_queries": len(queries), "build": build_report, "strategies": {}}
+        for strategy in strategies:
+            run["strategies"][strategy] = run_queries(manager, queries, strategy, corpus_matrix, position_by_guid)
+            if verbose:
+                total = run["strategies"][strategy]["latency_ms"]["total"]
+                print(f"  {strategy:<8} p50 {total['p50']:.2f} ms | p95 {total['p95']:.2f} ms | p99 {total['p99']:.2f} ms "
+                      f"| overlap with semantic top-{K_RETRIEVAL} {run['strategies'][strategy]['semantic_overlap_at_k']:.3f}")
+        results["runs"].append(run)
+    return results
+
+def compare_results(current, baseline):
+    """
+    Prints p95 total latency and semantic-overlap deltas against a previously saved result file.
+    """
+    baseline_runs = {run["corpus_size"]: run for run in baseline.get("runs", [])}
+    print(f"\n--- Comparison against baseline from {baseline.get('timestamp', 'unknown')} ---")
+    for run in current["runs"]:
+        previous = baseline_runs.get(run["corpus_size"])
+        if previous is None:
+            print(f"  {run['corpus_size']} articles: no baseline run.")
+            continue
+        for strategy, stats in run["strategies"].items():
+            old = previous["strategies"].get(strategy)
+            if old is None:
+                continue
+            new_p95, old_p95 = stats["latency_ms"]["total"]["p95"], old["latency_ms"]["total"]["p95"]
+            change = (new_p95 - old_p95) / old_p95 * 100 if old_p95 else 0.0
+            old_overlap = old.get("semantic_overlap_at_k", old.get("recall_at_k")) # Result files before the rename used "recall_at_k"
+            print(f"  {run['corpus_size']} articles, {strategy:<8} p95 {old_p95:.2f} -> {new_p95:.2f} ms ({change:+.1f}%) "
+                  f"| semantic overlap {old_overlap:.3f} -> {stats['semantic_overlap_at_k']:.3f}")
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval (semantic/lexical/hybrid) on synthetic article corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_CORPUS_SIZES, help="Corpus sizes to benchmark, e.g. 10000 100000 1000000")
+    parser.add_argument("--queries", type=int, default=DEFAULT_NUM_QUERIES, help="Number of queries replayed per strategy")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", help="Path to a previously saved result JSON to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.queries, args.strategies, seed=args.seed)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output_path = os.path.join(RESULTS_DIR, f"retrieval_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📝 Results saved to {output_path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare_results(results, json.load(f))
@@ -0,0 +1,188 @@
+import re
+
+# Configuration Constants for context assembly
+PASSAGE_TOKEN_TARGET = 120 # Approximate size of each passage created at index time
+CONTEXT_TOKEN_BUDGET = 1500 # Maximum approximate tokens of article context sent to the LLM
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+")
+_WORD_PATTERN = re.compile(r"\w+")
+# Labelled lines of the page_content built by k_base.load_data_into_documents
+_SCAFFOLD_LABEL_PATTERN = re.compile(r"^(Channel|Categories|Title|Description|Link|Content):[ \t]?(.*)$")
+_BODY_LABELS = ("Description", "Content")
+
+# --- Helper functions ---
+
+def estimate_tokens(text):
+    """
+    Cheap approximation of the LLM token count: one token per word or punctuation mark.
+    Good enough for budgeting without pulling in a model-specific tokenizer.
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+def article_key(doc):
+    """
+    Stable key linking an article Document to its passages.
+    """
+    return doc.metadata.get("guid") or doc.metadata.get("source", "")
+
+def article_body(doc):
+    """
+    The article text passages are built from: the description and the content
+    fields of page_content, without the Channel:/Categories:/Title:/Link: lines
+    (the context header carries those). Each field may span several lines, and
+    Content: is last, so everything after it belongs to the content.
+    Documents without that scaffolding are used as-is.
+    """
+    sections = {}
+    current_label = None
+    for line in doc.page_content.split("\n"):
+        match = _SCAFFOLD_LABEL_PATTERN.match(line) if current_label != "Content" else None
+        if match:
+            current_label = match.group(1)
+            sections[current_label] = [match.group(2)]
+        elif current_label is not None:
+            sections[current_label].append(line)
+    if current_label is None:
+        return doc.page_content
+
+    fields = []
+    for label in _BODY_LABELS:
+        text = "\n".join(sections.get(label, [])).strip()
+        if text and text not in fields:
+            fields.append(text)
+    if not fields:
+        # Only scaffolding in page_content: fall back to the description stored in metadata
+        return doc.metadata.get("original_description", "")
+    return "\n\n".join(fields)
+
+def _split_long_sentence(sentence, target_tokens):
+    """
+    Hard-splits a sentence longer than `target_tokens` into word-boundary pieces
+    of at most `target_tokens` tokens, so no passage is too big to ever fit the budget.
+    """
+    pieces = []
+    current_words = []
+    current_tokens = 0
+    for word in sentence.split():
+        word_tokens = estimate_tokens(word)
+        if current_words and current_tokens + word_tokens > target_tokens:
+            pieces.append(" ".join(current_words))
+            current_words, current_tokens = [], 0
+        current_words.append(word)
+        current_tokens += word_tokens
+    if current_words:
+        pieces.append(" ".join(current_words))
+    return pieces
+
+def split_into_passages(text, target_tokens=PASSAGE_TOKEN_TARGET):
+    """
+    Splits article body text into passages of roughly `target_tokens` tokens,
+    breaking on paragraphs first and sentences second so passages stay readable.
+    Returns a list of {"text", "tokens"} dicts in original order.
+    """
+    passages = []
+    current_parts = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current_parts, current_tokens
+        if current_parts:
+            passage_text = " ".join(current_parts)
+            passages.append({"text": passage_text, "tokens": estimate_tokens(passage_text)})
+        current_parts = []
+        current_tokens = 0
+
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for sentence in _SENTENCE_SPLIT_PATTERN.split(paragraph):
+            sentence_tokens = estimate_tokens(sentence)
+            if sentence_tokens > target_tokens:
+                # A run-on sentence becomes passages of its own
+                flush()
+                for piece in _split_long_sentence(sentence, target_tokens):
+                    current_parts.append(piece)
+                    current_tokens = estimate_tokens(piece)
+                    flush()
+                continue
+            if current_tokens and current_tokens + sentence_tokens > target_tokens:
+                flush()
+            current_parts.append(sentence)
+            current_tokens += sentence_tokens
+        # Paragraph boundaries are natural passage boundaries once a passage is half full
+        if current_tokens >= target_tokens // 2:
+            flush()
+    flush()
+    return passages
+
+def build_article_passages(all_docs, target_tokens=PASSAGE_TOKEN_TARGET):
+    """
+    Splits every article into passages at index time.
+    Only the article body (description and content, see article_body) is split;
+    the Channel:/Categories:/Title:/Link: lines of page_content are left out and
+    replaced by a compact header when the context is built.
+    """
+    passages_by_article = {}
+    for doc in all_docs:
+        passages_by_article[article_key(doc)] = split_into_passages(article_body(doc), target_tokens)
+    return passages_by_article
+
+def _article_header(doc):
+    metadata = doc.metadata
+    details = " | ".join(part for part in (metadata.get("channel_title"), metadata.get("publication_date"), metadata.get("source")) if part)
+    header = f"Title: {metadata.get('title', '')}"
+    return f"{header}\nSource: {details}" if details else header
+
+# --- Main context assembly function ---
+
+def build_context(query, ranked_docs_with_scores, passages_by_article=None, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Builds the LLM context from ranked articles under a token budget.
+    Every passage of every candidate article is scored by its article's rank and
+    by how many query terms it covers; passages are then taken best-first until
+    the budget is filled (each article's header counts the first time one of
+    its passages is taken). Selected passages are emitted grouped by article,
+    in rank order, and in their original order within the article.
+    Returns (context_string, tokens_used).
+    """
+    passages_by_article = passages_by_article or {}
+    query_terms = set(_WORD_PATTERN.findall(query.lower()))
+
+    candidates = []
+    for rank, (doc, _) in enumerate(ranked_docs_with_scores):
+        passages = passages_by_article.get(article_key(doc))
+        if passages is None:
+            # Index built before passages existed: split on the fly
+            passages = split_into_passages(article_body(doc))
+        article_weight = 1.0 / (rank + 1)
+        for position, passage in enumerate(passages):
+            passage_terms = set(_WORD_PATTERN.findall(passage["text"].lower()))
+            coverage = len(query_terms & passage_terms) / len(query_terms) if query_terms else 0.0
+            # The lead passage usually summarises the article, so give it a small bonus
+            lead_bonus = 0.1 if position == 0 else 0.0
+            score = article_weight * (1.0 + coverage + lead_bonus)
+            candidates.append((score, rank, position, passage))
+
+    tokens_used = 0
+    headers = {}
+    selected = {}
+    for score, rank, position, passage in sorted(candidates, key=lambda c: c[0], reverse=True):
+        doc = ranked_docs_with_scores[rank][0]
+        header_tokens = 0
+        if rank not in headers:
+            header = _article_header(doc)
+            header_tokens = estimate_tokens(header)
+        if tokens_used + header_tokens + passage["tokens"] > token_budget:
+            continue
+        if rank not in headers:
+            headers[rank] = header
+        tokens_used += header_tokens + passage["tokens"]
+        selected.setdefault(rank, []).append((position, passage["text"]))
+
+    sections = []
+    for rank in sorted(selected):
+        passage_texts = [text for _, text in sorted(selected[rank])]
+        sections.append(headers[rank] + "\n" + "\n".join(passage_texts))
+    return "\n\n---\n\n".join(sections), tokens_used
@@ -0,0 +1,146 @@
+import urllib.request
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+
+# === CONFIG ===
+FEED_TIMEOUT_SECONDS = 30
+SEEN_RUN_LIMIT = 5 # Stop reading a feed after this many consecutive already-seen items
+USER_AGENT = "Curate.Fun-FeedReader/1.0"
+
+ITEM_TAGS = {"item", "entry"} # RSS 2.0 / Atom
+
+
+class UnorderedFeedError(Exception):
+    """
+    Raised when a feed turns out not to be newest-first, so stopping at a run of
+    seen items could miss new ones. Callers should fall back to a full parse.
+    """
+
+
+# === HELPERS ===
+
+def _local_name(tag):
+    # '{http://www.w3.org/2005/Atom}entry' -> 'entry', '{...content/}encoded' -> 'encoded'
+    return tag.rsplit("}", 1)[-1]
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def _element_to_entry(item):
+    """
+    Converts an RSS <item> or Atom <entry> element into a dict with the same keys
+    feeds_new reads from feedparser entries (guid, id, link, title, published,
+    description, tags).
+    """
+    entry = {"tags": []}
+    for child in item:
+        name = _local_name(child.tag)
+        text = (child.text or "").strip()
+        if name == "guid":
+            entry["guid"] = text
+        elif name == "id":
+            entry["id"] = text
+        elif name == "title":
+            entry["title"] = text
+        elif name == "link":
+            # RSS has the URL as text, Atom as an href attribute (prefer rel="alternate")
+            href = child.get("href")
+            if href is None:
+                entry["link"] = text
+            elif child.get("rel", "alternate") == "alternate" or "link" not in entry:
+                entry["link"] = href
+        elif name in ("pubDate", "published") or (name in ("date", "updated") and "published" not in entry):
+            entry["published"] = text
+        elif name in ("description", "summary") or (name in ("encoded", "content") and "description" not in entry):
+            entry["description"] = text
+        elif name == "category":
+            term = child.get("term") or text
+            if term:
+                entry["tags"].append({"term": term})
+    if not entry["tags"]:
+        del entry["tags"]
+    return entry
+
+
+# === STREAMING READER ===
+
+def iter_feed_entries(stream, feed_info):
+    """
+    Incrementally parses an RSS/Atom document from a file-like `stream` and yields
+    entries one at a time. Each item element is cleared once converted, so memory
+    stays flat, and closing the generator early stops reading the stream.
+    The channel/feed title is stored in feed_info["title"] as soon as it is seen.
+    """
+    depth = 0
+    item_depth = None
+    for event, element in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if item_depth is None and _local_name(element.tag) in ITEM_TAGS:
+                item_depth = depth
+            continue
+
+        name = _local_name(element.tag)
+        # The title is a direct child of RSS <channel> (depth 3) or Atom <feed> (depth 2)
+        if name == "title" and depth in (2, 3) and (item_depth is None or depth < item_depth) and "title" not in feed_info:
+            feed_info["title"] = (element.text or "").strip() or "Untitled"
+        elif depth == item_depth and name in ITEM_TAGS:
+            entry = _element_to_entry(element)
+            element.clear()
+            yield entry
+        depth -= 1
+
+def read_new_entries(url, seen_guids, get_article_id, seen_run_limit=SEEN_RUN_LIMIT, timeout=FEED_TIMEOUT_SECONDS):
+    """
+    Streams a feed and collects unseen entries, stopping the download once
+    `seen_run_limit` consecutive items are already in `seen_guids`: RSS feeds are
+    newest-first, so everything after such a run has been seen before.
+    Returns (channel_title, new_entries, items_read).
+    Raises UnorderedFeedError if publication dates go up instead of down, and
+    lets ET.ParseError / network errors through so the caller can fall back to a full parse.
+    """
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    feed_info = {}
+    new_entries = []
+    items_read = 0
+    consecutive_seen = 0
+    previous_date = None
+
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        entries = iter_feed_entries(response, feed_info)
+        try:
+            for entry in entries:
+                items_read += 1
+
+                published = _parse_date(entry.get("published"))
+                if published is not None and previous_date is not None:
+                    try:
+                        newer_than_previous = published > previous_date
+                    except TypeError:
+                        newer_than_previous = False # Mixed naive/aware datetimes can't be compared
+                    if newer_than_previous:
+                        raise UnorderedFeedError(f"Item {items_read} is newer than the item before it.")
+                if published is not None:
+                    previous_date = published
+
+                if get_article_id(entry) in seen_guids:
+                    consecutive_seen += 1
+                    if consecutive_seen >= seen_run_limit:
+                        break # Early termination: the rest of the feed is older and already seen
+                else:
+                    consecutive_seen = 0
+                    new_entries.append(entry)
+        finally:
+            entries.close()
+
+    return feed_info.get("title", "Untitled"), new_entries, items_read
@@ -1,8 +1,18 @@
 import feedparser
 import re
 import os
+import json
+import time
+import heapq
+import random
+import argparse
+import subprocess
 from bs4 import BeautifulSoup
 import hashlib
+import xml.etree.ElementTree as ET
+from urllib.error import URLError
+from feed_stream import read_new_entries, UnorderedFeedError
+from near_duplicates import NearDuplicateIndex, collapse_near_duplicates
 
 # === CONFIG ===
 urls = [
@@ -23,9 +33,23 @@ urls = [
 output_dir = "feeds_output"
 all_new_articles_txt_file = os.path.join(output_dir, "all_new_articles.txt")
 seen_guids_file = os.path.join(output_dir, "seen_guids.txt")
+near_duplicate_index_file = os.path.join(output_dir, "near_duplicate_index.json")
+feed_schedule_file = os.path.join(output_dir, "feed_schedule.json")
+
+# Adaptive scheduler (daemon mode)
+MIN_POLL_INTERVAL = 5 * 60 # seconds
+MAX_POLL_INTERVAL = 6 * 60 * 60
+INITIAL_POLL_INTERVAL = 30 * 60
+TARGET_NEW_ITEMS_PER_POLL = 2 # Poll each feed about as often as it takes to publish this many items
+RATE_SMOOTHING = 0.3 # EWMA weight of the newest observed update rate
+POLL_JITTER = 0.1 # +/- fraction of the interval, so feeds don't synchronise
+MAX_ERROR_BACKOFF = 2 * 60 * 60
 
 # === HELPERS ===
 
+class FeedFetchError(Exception):
+    """Raised when a feed can't be fetched or parsed at all."""
+
 def safe_filename(name):
     return re.sub(r'\W+', '_', name).strip('_')
 
@@ -78,15 +102,33 @@ def get_article_id(entry):
     unique_string = f"{link}-{title}-{pub_date}"
     return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
 
-def download_and_extract_new_articles(url, seen_guids, new_guids_this_run):
+def fetch_new_entries(url, seen_guids):
+    """
+    Reads only the new part of a feed with the streaming reader, which stops at a
+    run of already-seen items. Falls back to a full feedparser parse for feeds that
+    aren't newest-first or that the strict XML parser can't handle.
+    Returns (channel_title, entries).
+    """
+    try:
+        channel_title, new_entries, items_read = read_new_entries(url, seen_guids, get_article_id)
+        print(f"⚡ Streamed {items_read} items from {url} ({len(new_entries)} new).")
+        return channel_title, new_entries
+    except (UnorderedFeedError, ET.ParseError, URLError, OSError) as e:
+        print(f"⚠️ Streaming read failed for {url} ({e}). Falling back to a full parse.")
+
     feed = feedparser.parse(url)
+    if feed.get("bozo") and not feed.entries:
+        raise FeedFetchError(f"Could not fetch or parse {url}: {feed.get('bozo_exception')}")
     channel = feed.feed
-    channel_title = channel.get("title", "Untitled")
+    return channel.get("title", "Untitled"), feed.entries
+
+def download_and_extract_new_articles(url, seen_guids, new_guids_this_run):
+    channel_title, entries = fetch_new_entries(url, seen_guids)
 
     articles_from_this_feed = []
     new_articles_count = 0
 
-    for entry in feed.entries:
+    for entry in entries:
         item_id = get_article_id(entry)
         if item_id in seen_guids:
             continue
@@ -100,7 +142,7 @@ def download_and_extract_new_articles(url, seen_guids, new_guids_this_run):
         raw_description = entry.get("description", "").strip()
         cleaned_description = clean_content(raw_description) # Apply cleaning logic to description
 
-        categories_list = [tag["term"] for tag in entry.tags] if "tags" in entry else []
+        categories_list = [tag["term"] for tag in entry.get("tags", [])]
         categories_str = ", ".join(categories_list)
 
         item_title = entry.get("title", "Untitled Item")
@@ -139,9 +181,67 @@ def save_articles_to_txt(articles, filepath):
             f.write(" " * 100 + "\n\n") # Separator between articles
     print(f"📝 Appended {len(articles)} new articles to plain text file: {filepath}")
 
+def update_articles_in_txt(filepath, updates_by_link):
+    """
+    Rewrites channel_title/categories of already-saved articles, keyed by link.
+    Used when a syndicated copy of an earlier article merges new channels or categories into it.
+    """
+    if not updates_by_link or not os.path.exists(filepath):
+        return
+    with open(filepath, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+
+    block_start = None
+    pending_categories = None
+    updated = 0
+    for i, line in enumerate(lines):
+        # Field lines start at column 0; multi-line description continuations are indented
+        if line.startswith("channel_title: "):
+            block_start = i
+            pending_categories = None
+        elif line.startswith("link: ") and block_start is not None:
+            link = line[len("link: "):].rstrip("\n").rstrip(",")
+            if link in updates_by_link:
+                channel_title, pending_categories = updates_by_link[link]
+                lines[block_start] = f'channel_title: {channel_title},\n'
+        elif line.startswith("categories: ") and pending_categories is not None:
+            lines[i] = f'categories: {pending_categories}\n'
+            pending_categories = None
+            updated += 1
+
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(tmp_path, filepath)
+    print(f"🔗 Merged syndicated copies into {updated} previously saved articles in {filepath}")
+
 
 # === MAIN WORKFLOW ===
 
+def persist_new_articles(articles, seen_guids, new_guids_this_run, near_duplicate_index):
+    """
+    Collapses near-duplicates, records the new GUIDs as seen and appends the
+    canonical articles to the text file. Returns the number of articles saved.
+    """
+    found_count = len(articles)
+
+    # Collapse the same story syndicated across feeds into one canonical article
+    articles, updated_existing = collapse_near_duplicates(articles, near_duplicate_index)
+    if found_count != len(articles):
+        print(f"Collapsed {found_count - len(articles)} near-duplicate copies; {len(articles)} canonical new articles remain.")
+
+    if articles:
+        save_articles_to_txt(articles, all_new_articles_txt_file)
+    update_articles_in_txt(all_new_articles_txt_file, updated_existing)
+
+    seen_guids.update(new_guids_this_run)
+    save_seen_guids(seen_guids_file, seen_guids)
+    print(f"Updated {len(seen_guids)} total seen article IDs in {seen_guids_file}")
+
+    # Saved last: an article is only indexed once it is in the text file
+    near_duplicate_index.save(near_duplicate_index_file)
+    return len(articles)
+
 def main():
     os.makedirs(output_dir, exist_ok=True)
 
@@ -153,22 +253,163 @@ def main():
 
     print("🚀 Downloading & Processing Feeds...")
     for url in urls:
-        new_articles_from_feed, articles_count = download_and_extract_new_articles(url, seen_guids, new_guids_this_run)
+        try:
+            new_articles_from_feed, articles_count = download_and_extract_new_articles(url, seen_guids, new_guids_this_run)
+        except FeedFetchError as e:
+            print(f"❌ {e}")
+            continue
         all_new_articles_data_list.extend(new_articles_from_feed)
 
     total_new_articles_found = len(all_new_articles_data_list)
     print(f"\nTotal unique new articles found this run: {total_new_articles_found}")
 
-    seen_guids.update(new_guids_this_run)
-    save_seen_guids(seen_guids_file, seen_guids)
-    print(f"Updated {len(seen_guids)} total seen article IDs in {seen_guids_file}")
-
-    if total_new_articles_found > 0:
-        save_articles_to_txt(all_new_articles_data_list, all_new_articles_txt_file)
-    else:
+    near_duplicate_index = NearDuplicateIndex.load(near_duplicate_index_file)
+    saved_count = persist_new_articles(all_new_articles_data_list, seen_guids, new_guids_this_run, near_duplicate_index)
+    if saved_count == 0:
         print("\nNo new articles found this run to save.")
 
     print("\n🎉 All Done.")
 
+
+# === ADAPTIVE SCHEDULER (DAEMON MODE) ===
+
+def load_feed_schedule(filepath):
+    if not os.path.exists(filepath):
+        return {}
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Could not read feed schedule '{filepath}' ({e}). Relearning update rates.")
+        return {}
+
+def save_feed_schedule(filepath, schedule):
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(schedule, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, filepath)
+
+def next_poll_interval(state):
+    """
+    Picks the next polling interval (seconds) for one feed from its learned
+    update rate (new items per hour), with exponential backoff after errors and
+    random jitter.
+    """
+    if state["consecutive_errors"]:
+        interval = min(MIN_POLL_INTERVAL * 2 ** state["consecutive_errors"], MAX_ERROR_BACKOFF)
+    elif state["rate_per_hour"] > 0:
+        interval = TARGET_NEW_ITEMS_PER_POLL / state["rate_per_hour"] * 3600
+    else:
+        # Nothing seen yet: back off gradually from the current interval
+        interval = state["interval"] * 1.5
+    interval = min(max(interval, MIN_POLL_INTERVAL), MAX_POLL_INTERVAL)
+    return interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+def update_feed_rate(state, new_count, now):
+    """
+    Folds the update rate observed since the previous poll into the feed's EWMA rate.
+    """
+    if state.get("last_poll"):
+        elapsed_hours = max((now - state["last_poll"]) / 3600, 1e-6)
+        observed_rate = new_count / elapsed_hours
+        state["rate_per_hour"] = RATE_SMOOTHING * observed_rate + (1 - RATE_SMOOTHING) * state["rate_per_hour"]
+    state["last_poll"] = now
+
+class IndexCommandRunner:
+    """
+    Runs the index command in the background, one run at a time, so a slow run
+    (e.g. pinecone-rag.py loading its embedding model) never delays other feeds'
+    polls. A request made while a run is in progress is remembered and started
+    on the first scheduler tick after that run finishes; the delta sync then
+    picks up everything saved since.
+    """
+    def __init__(self, index_command):
+        self.index_command = index_command
+        self.process = None
+        self.pending = False
+
+    def request(self):
+        self.pending = True
+        self.poll()
+
+    def poll(self):
+        """
+        Reaps a finished run and starts the pending one. Called on every scheduler tick.
+        """
+        if self.process is not None:
+            returncode = self.process.poll()
+            if returncode is None:
+                return # Still running
+            if returncode != 0:
+                print(f"❌ Index command exited with status {returncode}")
+            self.process = None
+        if self.pending:
+            self.pending = False
+            print(f"🗂️ Indexing new articles in the background: {self.index_command}")
+            self.process = subprocess.Popen(self.index_command, shell=True)
+
+def run_scheduler(index_command=None):
+    """
+    Long-running mode: polls every feed on its own adaptive interval, learned from
+    how many new items each poll finds, and hands new articles straight to the
+    text file (and to `index_command`, e.g. "python pinecone-rag.py", run in the
+    background if given).
+    Learned rates are persisted so a restart keeps its schedule.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    seen_guids = load_seen_guids(seen_guids_file)
+    near_duplicate_index = NearDuplicateIndex.load(near_duplicate_index_file)
+    schedule = load_feed_schedule(feed_schedule_file)
+    index_runner = IndexCommandRunner(index_command) if index_command else None
+
+    now = time.time()
+    queue = []
+    for url in urls:
+        state = schedule.setdefault(url, {"interval": INITIAL_POLL_INTERVAL, "rate_per_hour": 0.0, "consecutive_errors": 0, "last_poll": None})
+        # Feeds that were due while the daemon was down are polled right away
+        next_poll = (state["last_poll"] or 0) + state["interval"]
+        heapq.heappush(queue, (max(next_poll, now), url))
+    print(f"🕒 Adaptive feed scheduler started for {len(urls)} feeds. Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            next_poll, url = heapq.heappop(queue)
+            time.sleep(max(0.0, next_poll - time.time()))
+            if index_runner:
+                index_runner.poll()
+
+            state = schedule[url]
+            new_guids_this_poll = set()
+            now = time.time()
+            try:
+                articles, new_count = download_and_extract_new_articles(url, seen_guids, new_guids_this_poll)
+                state["consecutive_errors"] = 0
+                update_feed_rate(state, new_count, now)
+                if articles and persist_new_articles(articles, seen_guids, new_guids_this_poll, near_duplicate_index) and index_runner:
+                    index_runner.request()
+            except Exception as e:
+                state["consecutive_errors"] += 1
+                print(f"❌ Error polling {url} (attempt {state['consecutive_errors']}): {e}")
+
+            state["interval"] = next_poll_interval(state)
+            save_feed_schedule(feed_schedule_file, schedule)
+            print(f"⏭️ Next poll of {url} in {state['interval'] / 60:.1f} min "
+                  f"(~{state['rate_per_hour']:.2f} new items/hour).")
+            heapq.heappush(queue, (time.time() + state["interval"], url))
+    except KeyboardInterrupt:
+        save_feed_schedule(feed_schedule_file, schedule)
+        if index_runner and index_runner.process is not None:
+            print("⏳ Waiting for the running index command to finish...")
+            index_runner.process.wait()
+        print("\n👋 Scheduler stopped.")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download new articles from the configured RSS feeds.")
+    parser.add_argument("--daemon", action="store_true", help="Run continuously with an adaptive polling interval per feed")
+    parser.add_argument("--index-command", help='Command run after new articles are saved in daemon mode, e.g. "python pinecone-rag.py"')
+    args = parser.parse_args()
+
+    if args.daemon:
+        run_scheduler(args.index_command)
+    else:
+        main()
@@ -3,21 +3,19 @@
 import os
 import pickle
 import json
+import shutil
+import argparse
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.schema import Document
 from rank_bm25 import BM25Okapi
 from dotenv import load_dotenv
-from nltk import word_tokenize
-import nltk
+from lexical_tokenizer import LexicalTokenizer
+from context_builder import build_article_passages
+from metadata_index import MetadataIndex
+from sharded_retrieval import assign_shard, save_shard_manifest, SHARDS_DIR, SHARD_BY_OPTIONS
 import os # Ensure os is imported for path operations
 
-# NLTK Punkt tokenizer download (ensure this runs once)
-try:
-    nltk.data.find('tokenizers/punkt')
-except nltk.downloader.DownloadError:
-    nltk.download('punkt')
-
 # Load environment variables
 load_dotenv()
 
@@ -25,7 +23,10 @@ load_dotenv()
 JSON_FILE_PATH = r"M:\volunteering\Curate.Fun\chatbot\backend\feeds_output\all_new_articles.json"
 FAISS_DB_PATH = "db/faiss_index"
 BM25_INDEX_PATH = "db/bm25_index.pkl"
+LEXICAL_TOKENIZER_PATH = "db/lexical_tokenizer.pkl" # Tokenizer settings + term vocabulary used by the BM25 index
 ALL_DOCS_PATH = os.path.join("db", "all_article_docs.pkl") # Path to save raw documents
+PASSAGES_PATH = os.path.join("db", "article_passages.pkl") # Path to save per-article passages for context assembly
+METADATA_INDEX_PATH = os.path.join("db", "metadata_index.pkl") # Path to save channel/category/date posting lists
 
 # Ensure the 'db' directory exists for storing indexes
 os.makedirs("db", exist_ok=True)
@@ -75,10 +76,74 @@ def load_data_into_documents(file_path):
     
     return documents
 
+# --- Sharded build (served by shard_worker.py, queried through sharded_retrieval.py) ---
+def build_shards(all_docs, embeddings_model, num_shards, shard_by="hash", verbose=True, shards_dir=SHARDS_DIR, stem=False):
+    """
+    Partitions the articles into `num_shards` shards and writes a full set of
+    indexes per shard under `shards_dir`/shard_<i>/ (db/shards by default), plus a manifest.
+    All shards share one tokenizer vocabulary, and every shard's BM25 index uses
+    the corpus-wide IDF table and average document length, so BM25 scores from
+    different shards are comparable and the coordinator's merged top-k equals
+    the top-k of a single unsharded index.
+    """
+    if os.path.exists(shards_dir):
+        if verbose:
+            print(f"Removing previous shards in {shards_dir}...")
+        shutil.rmtree(shards_dir)
+    os.makedirs(shards_dir)
+
+    if verbose:
+        print(f"Tokenizing {len(all_docs)} articles for corpus-wide BM25 statistics...")
+    lexical_tokenizer = LexicalTokenizer(stem=stem)
+    tokenized_corpus_for_bm25 = lexical_tokenizer.encode_corpus([doc.page_content for doc in all_docs])
+    corpus_bm25 = BM25Okapi(tokenized_corpus_for_bm25)
+
+    positions_by_shard = [[] for _ in range(num_shards)]
+    for position, doc in enumerate(all_docs):
+        positions_by_shard[assign_shard(doc, num_shards, shard_by)].append(position)
+
+    manifest = {"num_shards": num_shards, "shard_by": shard_by, "shards": []}
+    for shard, positions in enumerate(positions_by_shard):
+        if not positions:
+            print(f"⚠️ Warning: Shard {shard} received no articles ({shard_by} partitioning). Skipping it.")
+            continue
+        shard_dir = os.path.join(shards_dir, f"shard_{shard}")
+        os.makedirs(shard_dir)
+        shard_docs = [all_docs[position] for position in positions]
+        if verbose:
+            print(f"Building shard {shard} ({len(shard_docs)} articles) in {shard_dir}...")
+
+        with open(os.path.join(shard_dir, os.path.basename(ALL_DOCS_PATH)), 'wb') as f:
+            pickle.dump(shard_docs, f)
+        with open(os.path.join(shard_dir, os.path.basename(PASSAGES_PATH)), 'wb') as f:
+            pickle.dump(build_article_passages(shard_docs), f)
+        with open(os.path.join(shard_dir, os.path.basename(METADATA_INDEX_PATH)), 'wb') as f:
+            pickle.dump(MetadataIndex.from_documents(shard_docs), f)
+
+        FAISS.from_documents(shard_docs, embeddings_model).save_local(os.path.join(shard_dir, os.path.basename(FAISS_DB_PATH)))
+
+        shard_bm25 = BM25Okapi([tokenized_corpus_for_bm25[position] for position in positions])
+        shard_bm25.idf = corpus_bm25.idf # Corpus-wide statistics keep scores comparable across shards
+        shard_bm25.avgdl = corpus_bm25.avgdl
+        with open(os.path.join(shard_dir, os.path.basename(BM25_INDEX_PATH)), 'wb') as f:
+            pickle.dump(shard_bm25, f)
+        with open(os.path.join(shard_dir, os.path.basename(LEXICAL_TOKENIZER_PATH)), 'wb') as f:
+            pickle.dump(lexical_tokenizer, f)
+
+        manifest["shards"].append({"path": f"shard_{shard}", "num_docs": len(shard_docs)})
+
+    manifest_path = os.path.join(shards_dir, "manifest.json")
+    save_shard_manifest(manifest, manifest_path)
+    if verbose:
+        print(f"Shard manifest saved to {manifest_path} ({len(manifest['shards'])} shards).")
+
 # --- Main function to prepare the knowledge base ---
-def prepare_knowledge_base(verbose=True):
+def prepare_knowledge_base(verbose=True, num_shards=0, shard_by="hash", stem=False):
     """
     Builds and saves the FAISS vector store and BM25 lexical index from article data.
+    With num_shards > 1, builds per-shard indexes under db/shards instead (see build_shards).
+    `stem` enables Porter stemming in the lexical tokenizer; it is saved with the
+    index, so queries are stemmed the same way.
     This function should be called as a separate process, not part of the main application runtime.
     """
     if verbose:
@@ -92,12 +157,42 @@ def prepare_knowledge_base(verbose=True):
 
     if verbose:
         print(f"Loaded {len(all_docs)} full article documents.")
+
+    if num_shards > 1:
+        if verbose:
+            print("Initializing Mixedbread AI Embeddings model (mxbai-embed-large-v1)...")
+        embeddings_model = HuggingFaceEmbeddings(model_name="mixedbread-ai/mxbai-embed-large-v1")
+        build_shards(all_docs, embeddings_model, num_shards, shard_by, verbose, stem=stem)
+        if verbose:
+            print("--- Sharded Knowledge Base Preparation Complete ---")
+        return
+
+    if verbose:
         print(f"Saving full article documents to {ALL_DOCS_PATH}...")
     with open(ALL_DOCS_PATH, 'wb') as f:
         pickle.dump(all_docs, f)
     if verbose:
         print("Full article documents saved.")
 
+    # Split articles into passages so retrieval can fill a token budget with the best passages
+    if verbose:
+        print("Splitting articles into passages for token-budgeted context assembly...")
+    passages_by_article = build_article_passages(all_docs)
+    with open(PASSAGES_PATH, 'wb') as f:
+        pickle.dump(passages_by_article, f)
+    if verbose:
+        print(f"Saved {sum(len(p) for p in passages_by_article.values())} passages to {PASSAGES_PATH}.")
+
+    # Build metadata posting lists so retrieval can be restricted by channel, category and date
+    if verbose:
+        print("Creating metadata pre-filter index (channel, category, date)...")
+    metadata_index = MetadataIndex.from_documents(all_docs)
+    with open(METADATA_INDEX_PATH, 'wb') as f:
+        pickle.dump(metadata_index, f)
+    if verbose:
+        print(f"Metadata index saved to {METADATA_INDEX_PATH} ({len(metadata_index.channel_postings)} channels, "
+              f"{len(metadata_index.category_postings)} categories, {len(metadata_index.date_postings)} days).")
+
     # Initialize Embeddings model (Mixedbread AI - mxbai-embed-large-v1)
     if verbose:
         print("Initializing Mixedbread AI Embeddings model (mxbai-embed-large-v1)...")
@@ -120,18 +215,27 @@ def prepare_knowledge_base(verbose=True):
     if verbose:
         print("Creating BM25 lexical index...")
     corpus = [doc.page_content for doc in all_docs]
-    tokenized_corpus_for_bm25 = [word_tokenize(doc.lower()) for doc in corpus]
+    lexical_tokenizer = LexicalTokenizer(stem=stem)
+    tokenized_corpus_for_bm25 = lexical_tokenizer.encode_corpus(corpus) # Integer term IDs, tokenized in worker processes
     bm25_index = BM25Okapi(tokenized_corpus_for_bm25)
     if verbose:
-        print("BM25 lexical index created.")
+        print(f"BM25 lexical index created ({len(lexical_tokenizer.vocabulary)} distinct terms).")
         print(f"Saving BM25 lexical index to {BM25_INDEX_PATH}...")
     with open(BM25_INDEX_PATH, 'wb') as f:
         pickle.dump(bm25_index, f)
+    with open(LEXICAL_TOKENIZER_PATH, 'wb') as f:
+        pickle.dump(lexical_tokenizer, f)
     if verbose:
         print("BM25 lexical index saved.")
+        print(f"Lexical tokenizer (vocabulary) saved to {LEXICAL_TOKENIZER_PATH}.")
     
     if verbose:
         print("--- Knowledge Base Preparation Complete ---")
 
 if __name__ == "__main__":
-    prepare_knowledge_base(verbose=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the RAG indexes from the collected articles.")
+    parser.add_argument("--shards", type=int, default=0, help="Partition the corpus into N shard indexes under db/shards (served by shard_worker.py)")
+    parser.add_argument("--shard-by", choices=SHARD_BY_OPTIONS, default="hash", help="Partition by article GUID hash or by channel")
+    parser.add_argument("--stem", action="store_true", help="Porter-stem terms in the BM25 index (and, through the saved tokenizer, in queries); requires nltk")
+    args = parser.parse_args()
+    prepare_knowledge_base(verbose=True, num_shards=args.shards, shard_by=args.shard_by, stem=args.stem)
\ No newline at end of file
@@ -0,0 +1,109 @@
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from multiprocessing import Pool
+import numpy as np
+
+# Configuration Constants for lexical tokenization
+PARALLEL_MIN_DOCS = 2000 # Below this many documents, tokenizing in-process is faster than starting workers
+CHUNK_SIZE = 500 # Documents sent to a worker process at a time
+
+_TOKEN_PATTERN = re.compile(r"\w+(?:['’.-]\w+)*")
+
+ENGLISH_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers
+herself him himself his how i if in into is it its itself just me more most my myself no nor not now of off on
+once only or other our ours ourselves out over own same she should so some such than that the their theirs them
+themselves then there these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves
+""".split())
+
+# --- Normalization helpers (shared by index time and query time) ---
+
+@lru_cache(maxsize=1)
+def _porter_stemmer():
+    # Imported lazily so NLTK is only loaded when stemming is actually enabled
+    from nltk.stem.porter import PorterStemmer
+    return PorterStemmer()
+
+@lru_cache(maxsize=200_000)
+def _stem(term):
+    return _porter_stemmer().stem(term)
+
+def normalize_terms(text, stem=False, remove_stopwords=True):
+    """
+    Lowercases (with Unicode NFKC folding), splits on a precompiled word pattern,
+    and optionally drops English stopwords and Porter-stems the remaining terms.
+    """
+    terms = _TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).lower())
+    if remove_stopwords:
+        terms = [term for term in terms if term not in ENGLISH_STOPWORDS]
+    if stem:
+        terms = [_stem(term) for term in terms]
+    return terms
+
+def _encode_chunk(args):
+    """
+    Worker: normalizes a chunk of documents and encodes them against a chunk-local
+    vocabulary. Returns (local_terms, [np.ndarray of local term ids per document]).
+    """
+    texts, stem, remove_stopwords = args
+    local_ids = {}
+    encoded = []
+    for text in texts:
+        terms = normalize_terms(text, stem, remove_stopwords)
+        encoded.append(np.fromiter((local_ids.setdefault(term, len(local_ids)) for term in terms), dtype=np.int32, count=len(terms)))
+    return list(local_ids), encoded
+
+
+# --- Tokenizer holding the normalization settings and the term vocabulary ---
+class LexicalTokenizer:
+    """
+    Regex-based tokenizer/normalizer with a compiled term vocabulary.
+    The same instance (pickled next to the BM25 index) is used to encode the
+    corpus at index time and queries at query time, so both sides always use
+    identical normalization and term IDs.
+    """
+    def __init__(self, stem: bool = False, remove_stopwords: bool = True):
+        self.stem = stem
+        self.remove_stopwords = remove_stopwords
+        self.vocabulary = {} # term -> integer term id
+
+    def tokenize(self, text):
+        return normalize_terms(text, self.stem, self.remove_stopwords)
+
+    def encode_corpus(self, texts, workers=None):
+        """
+        Tokenizes a corpus into lists of integer term IDs, extending the vocabulary.
+        Large corpora are split into chunks tokenized by a pool of worker processes;
+        each chunk's local IDs are then remapped to global IDs in one vectorized step.
+        """
+        texts = list(texts)
+        chunks = [(texts[i:i + CHUNK_SIZE], self.stem, self.remove_stopwords) for i in range(0, len(texts), CHUNK_SIZE)]
+        workers = workers or os.cpu_count() or 1
+
+        if workers > 1 and len(texts) >= PARALLEL_MIN_DOCS:
+            with Pool(processes=workers) as pool:
+                chunk_results = pool.map(_encode_chunk, chunks)
+        else:
+            chunk_results = [_encode_chunk(chunk) for chunk in chunks]
+
+        encoded_corpus = []
+        for local_terms, encoded_docs in chunk_results:
+            local_to_global = np.fromiter(
+                (self.vocabulary.setdefault(term, len(self.vocabulary)) for term in local_terms),
+                dtype=np.int32,
+                count=len(local_terms)
+            )
+            encoded_corpus.extend(local_to_global[doc_ids].tolist() for doc_ids in encoded_docs)
+        return encoded_corpus
+
+    def encode_query(self, text):
+        """
+        Encodes a query with the corpus vocabulary. Terms never seen in the corpus
+        are dropped since they cannot contribute to any BM25 score.
+        """
+        vocabulary = self.vocabulary
+        return [vocabulary[term] for term in self.tokenize(text) if term in vocabulary]
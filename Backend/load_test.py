@@ -0,0 +1,159 @@
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import numpy as np
+import socketio
+
+# === CONFIG ===
+DEFAULT_SERVER_URL = "http://localhost:5000"
+DEFAULT_ORIGIN = "http://localhost:3000" # app.py only accepts Socket.IO connections from the React frontend's origin
+QUESTIONS = [
+    "What is Curate.Fun?",
+    "Summarize the latest Solana news.",
+    "Which Ethereum grants were announced this week?",
+    "What is happening with stablecoins?",
+    "Explain account abstraction in simple terms.",
+    "Any news about NEAR or Sui?",
+]
+# Replies from app.py / ai.py that mean the request failed
+ERROR_RESPONSES = {
+    "An internal server error occurred.",
+    "I'm sorry, I couldn't get a response from the AI at the moment. Please try again later.",
+}
+
+
+# === RESULT TRACKING ===
+
+class LoadTestStats:
+    """
+    Matches replies to requests and records end-to-end latency. The server
+    broadcasts every message to every client, so each request carries a unique
+    text: the echoed user message links that text to the server's traceId, and
+    the AI reply with the same traceId completes the request. Duplicate copies
+    received by other clients are ignored.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent_at = {} # request text -> send time
+        self.text_by_trace = {} # traceId -> request text
+        self.latencies = []
+        self.errors = 0
+        self.sent = 0
+        self.first_sent = None
+        self.last_completed = None
+
+    def record_sent(self, text):
+        with self._lock:
+            now = time.perf_counter()
+            self.sent_at[text] = now
+            self.sent += 1
+            self.first_sent = self.first_sent or now
+
+    def on_message(self, message):
+        now = time.perf_counter()
+        trace_id = message.get("traceId")
+        with self._lock:
+            if message.get("sender") == "user":
+                if message.get("text") in self.sent_at and trace_id:
+                    self.text_by_trace.setdefault(trace_id, message["text"])
+                return
+            text = self.text_by_trace.pop(trace_id, None)
+            if text is None or text not in self.sent_at:
+                return # Someone else's reply, or a duplicate we already counted
+            started = self.sent_at.pop(text)
+            if message.get("text") in ERROR_RESPONSES:
+                self.errors += 1
+            else:
+                self.latencies.append(now - started)
+            self.last_completed = now
+
+    def pending(self):
+        with self._lock:
+            return len(self.sent_at)
+
+    def report(self):
+        with self._lock:
+            completed = len(self.latencies)
+            timeouts = len(self.sent_at)
+            elapsed = (self.last_completed - self.first_sent) if self.first_sent and self.last_completed else 0.0
+            latencies_ms = np.array(self.latencies) * 1000.0
+            return {
+                "sent": self.sent,
+                "completed": completed,
+                "errors": self.errors,
+                "timeouts": timeouts,
+                "error_rate": round((self.errors + timeouts) / self.sent, 4) if self.sent else 0.0,
+                "throughput_per_sec": round(completed / elapsed, 3) if elapsed else 0.0,
+                "latency_ms": {
+                    "p50": round(float(np.percentile(latencies_ms, 50)), 1) if completed else None,
+                    "p99": round(float(np.percentile(latencies_ms, 99)), 1) if completed else None,
+                    "max": round(float(latencies_ms.max()), 1) if completed else None,
+                },
+            }
+
+
+# === LOAD GENERATION ===
+
+def connect_clients(server_url, num_clients, stats, origin=DEFAULT_ORIGIN):
+    clients = []
+    for _ in range(num_clients):
+        client = socketio.Client(reconnection=False)
+        client.on("message", stats.on_message)
+        client.connect(server_url, headers={"Origin": origin})
+        clients.append(client)
+    return clients
+
+def run_load_test(server_url, num_clients, rate, duration, timeout, seed=None, origin=DEFAULT_ORIGIN):
+    """
+    Opens `num_clients` Socket.IO connections and sends chatMessage events as an
+    open-loop Poisson process at `rate` messages/second for `duration` seconds,
+    then waits up to `timeout` seconds for outstanding replies.
+    """
+    rng = random.Random(seed)
+    stats = LoadTestStats()
+    run_id = uuid.uuid4().hex[:8]
+    print(f"🔌 Connecting {num_clients} clients to {server_url}...")
+    clients = connect_clients(server_url, num_clients, stats, origin)
+
+    print(f"🚀 Sending ~{rate} msg/s for {duration}s (run {run_id})...")
+    start = time.perf_counter()
+    next_send = start
+    sequence = 0
+    try:
+        while next_send - start < duration:
+            time.sleep(max(0.0, next_send - time.perf_counter()))
+            text = f"[load-test {run_id}-{sequence}] {rng.choice(QUESTIONS)}"
+            stats.record_sent(text)
+            clients[sequence % num_clients].emit("chatMessage", {"text": text, "sender": "user"})
+            sequence += 1
+            next_send += rng.expovariate(rate) # Poisson arrivals, independent of response times
+
+        deadline = time.perf_counter() + timeout
+        while stats.pending() and time.perf_counter() < deadline:
+            time.sleep(0.1)
+    finally:
+        for client in clients:
+            client.disconnect()
+    return stats.report()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Socket.IO load test for the chat backend (run app.py with LLM_BASE_URL pointing at mock_llm_server.py).")
+    parser.add_argument("--url", default=DEFAULT_SERVER_URL)
+    parser.add_argument("--origin", default=DEFAULT_ORIGIN, help="Origin header sent by the clients (must be allowed by app.py's CORS setting)")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent Socket.IO connections")
+    parser.add_argument("--rate", type=float, default=5.0, help="Messages per second across all clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep sending")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for outstanding replies")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run_load_test(args.url, args.clients, args.rate, args.duration, args.timeout, args.seed, args.origin)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "report": report}, f, indent=2)
+        print(f"📝 Report saved to {args.output}")
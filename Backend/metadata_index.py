@@ -0,0 +1,142 @@
+import datetime
+from email.utils import parsedate_to_datetime
+import numpy as np
+
+FILTER_KEYS = ("channels", "categories", "since", "until") # Keyword arguments of MetadataIndex.filter_doc_ids
+
+# --- Helper functions ---
+
+def normalize_value(value):
+    return value.strip().lower()
+
+def split_categories(categories):
+    """
+    Article categories (and merged channel titles) are stored as a comma-separated string (see feeds_new.py).
+    """
+    if isinstance(categories, (list, tuple)):
+        return [c for c in categories if c and c.strip()]
+    return [c for c in (categories or "").split(",") if c.strip()]
+
+def _as_list(values):
+    # A single channel/category passed as a string would otherwise be iterated character by character
+    return [values] if isinstance(values, str) else values
+
+def parse_publication_date(value):
+    """
+    Parses a feed publication date (RFC 822 like 'Tue, 10 Jun 2025 14:00:00 GMT',
+    or ISO 8601) into a date. Returns None if the value can't be parsed.
+    """
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).date()
+    except (TypeError, ValueError, IndexError):
+        pass
+    try:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+    except ValueError:
+        return None
+
+def _to_date(value):
+    """
+    Converts a since/until bound to a date. Raises ValueError for a bound that
+    can't be parsed, rather than silently dropping it and matching every date.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    parsed = parse_publication_date(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError(f"Unparseable date filter {value!r}; use a date, a datetime or an ISO/RFC 822 date string.")
+    return parsed
+
+def validate_filters(filters):
+    """
+    Checks a retrieval `filters` dict before it is passed to filter_doc_ids.
+    Returns (known_filters, unknown_keys), so a misspelled key (e.g. "channel")
+    can be reported instead of raising TypeError. Raises ValueError for
+    unparseable since/until bounds.
+    """
+    known_filters = {key: value for key, value in filters.items() if key in FILTER_KEYS}
+    unknown_keys = sorted(key for key in filters if key not in FILTER_KEYS)
+    _to_date(known_filters.get("since"))
+    _to_date(known_filters.get("until"))
+    return known_filters, unknown_keys
+
+def _union(postings):
+    if not postings:
+        return np.empty(0, dtype=np.int32)
+    if len(postings) == 1:
+        return postings[0]
+    return np.unique(np.concatenate(postings))
+
+
+# --- Class holding the precomputed metadata posting lists ---
+class MetadataIndex:
+    """
+    Posting lists over article metadata (channel, category, publication day).
+    Each posting list is a sorted array of document positions in `all_docs`,
+    which are also the BM25 corpus positions, so a filter can restrict
+    semantic and lexical scoring to a subset before any scoring happens.
+    """
+    def __init__(self, num_docs: int, channel_postings: dict, category_postings: dict, date_postings: dict):
+        self.num_docs = num_docs
+        self.channel_postings = channel_postings # normalized channel title -> np.ndarray of doc ids
+        self.category_postings = category_postings # normalized category -> np.ndarray of doc ids
+        self.date_postings = date_postings # date ordinal -> np.ndarray of doc ids
+        self.sorted_date_ordinals = np.array(sorted(date_postings), dtype=np.int64)
+
+    @classmethod
+    def from_documents(cls, all_docs):
+        """
+        Builds the posting lists from the article Documents created by k_base.load_data_into_documents.
+        """
+        channels, categories, dates = {}, {}, {}
+        for doc_id, doc in enumerate(all_docs):
+            metadata = doc.metadata
+            # Near-duplicate collapsing at ingest can merge several channels into one comma-separated title
+            for channel in {normalize_value(c) for c in split_categories(metadata.get("channel_title", ""))}:
+                channels.setdefault(channel, []).append(doc_id)
+            for category in {normalize_value(c) for c in split_categories(metadata.get("categories", ""))}:
+                categories.setdefault(category, []).append(doc_id)
+            publication_date = parse_publication_date(metadata.get("publication_date", ""))
+            if publication_date is not None:
+                dates.setdefault(publication_date.toordinal(), []).append(doc_id)
+
+        def as_postings(groups):
+            return {key: np.array(ids, dtype=np.int32) for key, ids in groups.items()}
+
+        return cls(len(all_docs), as_postings(channels), as_postings(categories), as_postings(dates))
+
+    def filter_doc_ids(self, channels=None, categories=None, since=None, until=None):
+        """
+        Returns the sorted doc ids matching all given filters (values within one
+        filter are OR-ed, filters are AND-ed). `since`/`until` are inclusive and
+        may be dates, datetimes or date strings (ValueError if unparseable).
+        `channels`/`categories` take a list of values or a single string.
+        Returns None when no filter is given, meaning "search the whole corpus".
+        """
+        facets = []
+        if channels:
+            facets.append(_union([self.channel_postings[key] for key in map(normalize_value, _as_list(channels)) if key in self.channel_postings]))
+        if categories:
+            facets.append(_union([self.category_postings[key] for key in map(normalize_value, _as_list(categories)) if key in self.category_postings]))
+        if since is not None or until is not None:
+            since_date, until_date = _to_date(since), _to_date(until)
+            lo = np.searchsorted(self.sorted_date_ordinals, since_date.toordinal(), side="left") if since_date else 0
+            hi = np.searchsorted(self.sorted_date_ordinals, until_date.toordinal(), side="right") if until_date else len(self.sorted_date_ordinals)
+            facets.append(_union([self.date_postings[int(ordinal)] for ordinal in self.sorted_date_ordinals[lo:hi]]))
+
+        if not facets:
+            return None
+        # Intersect the smallest posting lists first
+        facets.sort(key=len)
+        result = facets[0]
+        for postings in facets[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, postings, assume_unique=True)
+        return result
@@ -0,0 +1,135 @@
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Latency histogram buckets in seconds (Prometheus default buckets, extended for LLM calls)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_NAME = "curate_stage_latency_seconds"
+# Output-token histogram buckets (LLM completions are capped at a few hundred tokens)
+TOKEN_BUCKETS = (16, 32, 64, 128, 192, 256, 384, 512, 768, 1024)
+TOKENS_METRIC_NAME = "curate_llm_output_tokens"
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+# --- Histogram aggregation ---
+class Histogram:
+    """
+    Cumulative-bucket latency histogram, safe to observe from several threads.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            for i, upper_bound in enumerate(self.buckets):
+                if seconds <= upper_bound:
+                    self.bucket_counts[i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.bucket_counts), self.count, self.total
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def observe(stage, seconds):
+    """
+    Records one duration for `stage`, creating its histogram on first use.
+    """
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(stage, Histogram())
+    histogram.observe(seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["spans"].append((stage, seconds))
+
+_token_histograms = {}
+
+def observe_output_tokens(mode, tokens):
+    """
+    Records the number of tokens one LLM completion generated in response `mode`.
+    """
+    histogram = _token_histograms.get(mode)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _token_histograms.setdefault(mode, Histogram(TOKEN_BUCKETS))
+    histogram.observe(tokens)
+
+# --- Per-request traces ---
+def start_trace(trace_id=None):
+    """
+    Starts a trace for the current request (thread / greenlet / context) and returns its ID.
+    Spans observed until end_trace() are attached to it.
+    """
+    trace_id = trace_id or uuid.uuid4().hex[:16]
+    _current_trace.set({"trace_id": trace_id, "started": time.perf_counter(), "spans": []})
+    return trace_id
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace["trace_id"] if trace else None
+
+def end_trace():
+    """
+    Ends the current trace and prints one structured line with every span, e.g.
+    [trace 3f2a...] total=1843.2ms socketio_receive=0.4ms llm_ttft=950.1ms llm_total=1830.7ms emit=0.6ms
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    _current_trace.set(None)
+    total = time.perf_counter() - trace["started"]
+    observe("request_total", total)
+    spans = " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in trace["spans"])
+    print(f"[trace {trace['trace_id']}] total={total * 1000:.1f}ms {spans}")
+    return trace
+
+@contextmanager
+def timed_stage(stage):
+    """
+    Context manager timing a block as one span of `stage`:
+
+        with timed_stage("faiss_search"):
+            ...
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+# --- Prometheus exposition ---
+def _render_histograms(name, help_text, label, histograms):
+    lines = [
+        f"# HELP {name} {help_text}",
+        f"# TYPE {name} histogram",
+    ]
+    with _histograms_lock:
+        items = sorted(histograms.items())
+    for value, histogram in items:
+        bucket_counts, count, total = histogram.snapshot()
+        for upper_bound, bucket_count in zip(histogram.buckets, bucket_counts):
+            lines.append(f'{name}_bucket{{{label}="{value}",le="{upper_bound}"}} {bucket_count}')
+        lines.append(f'{name}_bucket{{{label}="{value}",le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{{label}="{value}"}} {total}')
+        lines.append(f'{name}_count{{{label}="{value}"}} {count}')
+    return lines
+
+def render_prometheus():
+    """
+    Renders every stage latency histogram and the per-mode output-token histograms
+    in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = _render_histograms(METRIC_NAME, "Latency of each chat/RAG pipeline stage in seconds.", "stage", _histograms)
+    lines += _render_histograms(TOKENS_METRIC_NAME, "Tokens generated per LLM completion, by response mode.", "mode", _token_histograms)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,97 @@
+import json
+import time
+import random
+import argparse
+from flask import Flask, request, jsonify, Response
+
+# === CONFIG (overridable from the command line) ===
+MOCK_CONFIG = {
+    "ttft": 0.5, # Seconds before the first token
+    "token_delay": 0.02, # Seconds between streamed tokens
+    "tokens": 120, # Tokens per ReAct-style completion
+    "direct_tokens": 40, # Tokens per direct-answer completion (prompts without a "Final Answer:" section)
+    "jitter": 0.2, # +/- fraction applied to every delay
+    "error_rate": 0.0, # Fraction of requests answered with HTTP 500
+}
+
+FINAL_ANSWER = "Final Answer: This is a mock response from the load-test LLM server."
+DIRECT_ANSWER = "This is a mock direct response from the load-test LLM server."
+
+app = Flask(__name__)
+
+# === HELPERS ===
+
+def _sleep(seconds):
+    jitter = MOCK_CONFIG["jitter"]
+    time.sleep(max(0.0, seconds * random.uniform(1 - jitter, 1 + jitter)))
+
+def _completion_tokens(messages):
+    prompt = " ".join(str(message.get("content", "")) for message in messages)
+    if "Final Answer:" not in prompt:
+        # Direct-answer prompt: just the answer, padded to the configured length
+        answer_tokens = DIRECT_ANSWER.split(" ")
+        return answer_tokens + ["..."] * max(MOCK_CONFIG["direct_tokens"] - len(answer_tokens), 0)
+    # Mimic the ReAct layout ai.py expects: reasoning text, then the "Final Answer:" section
+    answer_tokens = FINAL_ANSWER.split(" ")
+    filler_count = max(MOCK_CONFIG["tokens"] - len(answer_tokens), 0)
+    return ["Thought: reasoning"] * filler_count + answer_tokens
+
+def _chunk(completion_id, model, content=None, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+# === OPENAI-COMPATIBLE ENDPOINT ===
+
+@app.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    body = request.get_json(force=True)
+    model = body.get("model", "mock-llm")
+    completion_id = f"chatcmpl-mock-{random.getrandbits(48):x}"
+
+    if random.random() < MOCK_CONFIG["error_rate"]:
+        return jsonify({"error": {"message": "Injected mock failure", "type": "server_error"}}), 500
+
+    tokens = _completion_tokens(body.get("messages", []))
+
+    if body.get("stream"):
+        def generate():
+            _sleep(MOCK_CONFIG["ttft"])
+            for i, token in enumerate(tokens):
+                if i:
+                    _sleep(MOCK_CONFIG["token_delay"])
+                content = token if i == 0 else " " + token
+                yield f"data: {json.dumps(_chunk(completion_id, model, content))}\n\n"
+            yield f"data: {json.dumps(_chunk(completion_id, model, finish_reason='stop'))}\n\n"
+            yield "data: [DONE]\n\n"
+        return Response(generate(), mimetype="text/event-stream")
+
+    _sleep(MOCK_CONFIG["ttft"] + MOCK_CONFIG["token_delay"] * (len(tokens) - 1))
+    return jsonify({
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(tokens)}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(body.get("messages", [])), "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+    })
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server for load tests (set LLM_BASE_URL=http://localhost:<port>/v1).")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=MOCK_CONFIG["ttft"], help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=MOCK_CONFIG["token_delay"], help="Seconds between tokens")
+    parser.add_argument("--tokens", type=int, default=MOCK_CONFIG["tokens"], help="Tokens per ReAct-style completion")
+    parser.add_argument("--direct-tokens", type=int, default=MOCK_CONFIG["direct_tokens"], help="Tokens per direct-answer completion")
+    parser.add_argument("--jitter", type=float, default=MOCK_CONFIG["jitter"], help="+/- fraction applied to every delay")
+    parser.add_argument("--error-rate", type=float, default=MOCK_CONFIG["error_rate"], help="Fraction of requests that fail with HTTP 500")
+    args = parser.parse_args()
+
+    MOCK_CONFIG.update(ttft=args.ttft, token_delay=args.token_delay, tokens=args.tokens, direct_tokens=args.direct_tokens, jitter=args.jitter, error_rate=args.error_rate)
+    print(f"🧪 Mock LLM server on http://localhost:{args.port}/v1 with {MOCK_CONFIG}")
+    app.run(host='0.0.0.0', port=args.port, threaded=True)
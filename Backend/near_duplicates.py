@@ -0,0 +1,193 @@
+import os
+import json
+import zlib
+import numpy as np
+from lexical_tokenizer import normalize_terms
+
+# === CONFIG ===
+NUM_PERMUTATIONS = 64 # MinHash signature length
+LSH_BANDS = 8 # 8 bands x 8 rows: pairs above ~0.77 Jaccard almost always share a bucket
+SIMILARITY_THRESHOLD = 0.8 # Estimated Jaccard similarity at which two articles are the same story
+SHINGLE_SIZE = 3 # Word n-grams
+MIN_SHINGLES = 8 # Shorter texts (e.g. a bare "GM" title) are too generic to call two articles the same story
+MAX_INDEXED_ARTICLES = 50000 # Oldest canonical articles are forgotten beyond this
+PERMUTATION_SEED = 20250601 # Must never change, or persisted signatures become incomparable
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+# === HELPERS ===
+
+def _merge_list(existing, values):
+    merged = list(existing)
+    for value in values:
+        if value and value not in merged:
+            merged.append(value)
+    return merged
+
+def split_list_field(value):
+    """
+    channel_title and categories are stored as comma-separated strings in the article dicts.
+    """
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+# === NEAR-DUPLICATE INDEX ===
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures with an LSH band index over canonical articles, persisted
+    as JSON across runs. Syndicated copies of a story (same text under a different
+    GUID/link in another feed) are found in roughly constant time and collapsed
+    into the canonical article, whose channels and categories are merged.
+    """
+    def __init__(self, num_permutations=NUM_PERMUTATIONS, bands=LSH_BANDS, threshold=SIMILARITY_THRESHOLD):
+        if num_permutations % bands:
+            raise ValueError("num_permutations must be a multiple of bands")
+        self.num_permutations = num_permutations
+        self.bands = bands
+        self.rows = num_permutations // bands
+        self.threshold = threshold
+        rng = np.random.default_rng(PERMUTATION_SEED)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self.articles = {} # canonical guid -> {"signature", "link", "channels", "categories", "aliases"}
+        self.buckets = {} # (band, band hash) -> [canonical guid, ...]
+
+    # --- Persistence ---
+    @classmethod
+    def load(cls, filepath):
+        index = cls()
+        if not os.path.exists(filepath):
+            return index
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("num_permutations") != index.num_permutations or data.get("bands") != index.bands:
+            print(f"⚠️ Warning: Near-duplicate index '{filepath}' uses different MinHash settings. Starting a new index.")
+            return index
+        for canonical_id, record in data.get("articles", {}).items():
+            record["signature"] = np.array(record["signature"], dtype=np.uint64)
+            index._insert(canonical_id, record)
+        return index
+
+    def save(self, filepath):
+        # Forget the oldest canonical articles (dicts keep insertion order)
+        overflow = len(self.articles) - MAX_INDEXED_ARTICLES
+        for canonical_id in list(self.articles)[:max(overflow, 0)]:
+            del self.articles[canonical_id]
+        data = {
+            "num_permutations": self.num_permutations,
+            "bands": self.bands,
+            "articles": {
+                canonical_id: {**record, "signature": record["signature"].tolist()}
+                for canonical_id, record in self.articles.items()
+            },
+        }
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, filepath)
+
+    # --- MinHash / LSH ---
+    def shingles(self, text):
+        """
+        Word shingles of the normalized text.
+        """
+        terms = normalize_terms(text, remove_stopwords=False)
+        return {" ".join(terms[i:i + SHINGLE_SIZE]) for i in range(len(terms) - SHINGLE_SIZE + 1)}
+
+    def signature(self, shingles):
+        """
+        MinHash signature over a non-empty set of shingles.
+        """
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) % _MERSENNE_PRIME for s in shingles), dtype=np.uint64, count=len(shingles))
+        # Universal hashing (a*x + b) mod p per permutation; a, x < 2^31 so the product fits in uint64
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _insert(self, canonical_id, record):
+        self.articles[canonical_id] = record
+        for key in self._band_keys(record["signature"]):
+            self.buckets.setdefault(key, []).append(canonical_id)
+
+    def find_duplicate(self, signature, exclude_id=None):
+        """
+        Returns the canonical guid of the most similar indexed article whose
+        estimated Jaccard similarity reaches the threshold, or None. `exclude_id`
+        (the article's own guid) never counts as its duplicate.
+        """
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+        best_id, best_similarity = None, self.threshold
+        for canonical_id in candidates:
+            record = self.articles.get(canonical_id)
+            if record is None or canonical_id == exclude_id:
+                continue # Forgotten by the size cap, or the article itself
+            similarity = float(np.mean(record["signature"] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = canonical_id, similarity
+        return best_id
+
+    def add(self, article, signature):
+        self._insert(article["guid"], {
+            "signature": signature,
+            "link": article.get("link", ""),
+            "channels": split_list_field(article.get("channel_title")),
+            "categories": split_list_field(article.get("categories")),
+            "aliases": [],
+        })
+
+    def merge(self, canonical_id, article):
+        """
+        Records `article` as a copy of the canonical article and merges its channel
+        and categories. Returns True if the canonical article's metadata changed.
+        """
+        record = self.articles[canonical_id]
+        channels = _merge_list(record["channels"], split_list_field(article.get("channel_title")))
+        categories = _merge_list(record["categories"], split_list_field(article.get("categories")))
+        changed = channels != record["channels"] or categories != record["categories"]
+        record["channels"], record["categories"] = channels, categories
+        record["aliases"] = _merge_list(record["aliases"], [article["guid"]])
+        return changed
+
+
+def collapse_near_duplicates(articles, index):
+    """
+    Collapses syndicated copies among `articles` and against articles indexed in
+    earlier runs. Returns (canonical_articles, updated_existing): the articles to
+    append this run, with merged channel_title/categories, and {link: (channel_title,
+    categories)} for canonical articles from earlier runs whose metadata changed.
+    Articles with fewer than MIN_SHINGLES shingles are always kept, and an article
+    already indexed under its own guid (e.g. refetched after a failed save) is
+    kept as canonical rather than matched against itself.
+    """
+    canonical_articles = []
+    canonical_this_run = {}
+    updated_existing = {}
+    for article in articles:
+        shingles = index.shingles(f"{article.get('title', '')}\n{article.get('description', '')}")
+        if len(shingles) < MIN_SHINGLES:
+            canonical_articles.append(article)
+            continue
+        signature = index.signature(shingles)
+        canonical_id = index.find_duplicate(signature, exclude_id=article["guid"])
+        if canonical_id is None:
+            if article["guid"] not in index.articles:
+                index.add(article, signature)
+            canonical_this_run[article["guid"]] = article
+            canonical_articles.append(article)
+            continue
+
+        if index.merge(canonical_id, article):
+            record = index.articles[canonical_id]
+            merged_fields = (", ".join(record["channels"]), ", ".join(record["categories"]))
+            if canonical_id in canonical_this_run:
+                canonical_this_run[canonical_id]["channel_title"], canonical_this_run[canonical_id]["categories"] = merged_fields
+            else:
+                updated_existing[record["link"]] = merged_fields
+    return canonical_articles, updated_existing
@@ -2,6 +2,7 @@ from pinecone import Pinecone,ServerlessSpec
 import os,re
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
+from pinecone_sync import load_sync_manifest, save_sync_manifest, upsert_to_pinecone, run_delta_sync
 
 load_dotenv()
 
@@ -15,6 +16,8 @@ PINECONE_ENVIRONMENT = "us-east-1"
 index = pc.Index(name=PINECONE_INDEX_NAME)
 
 TXT_FILE_PATH = "feeds_output/all_new_articles.txt" # Path to your generated TXT file
+SYNC_MANIFEST_PATH = "feeds_output/pinecone_sync_manifest.json" # Article ID -> content hash -> last-upserted version
+DEAD_LETTER_PATH = "feeds_output/pinecone_dead_letter.jsonl" # IDs of batches that failed every retry, replayed next run
 BATCH_SIZE = 100 
 
 def load_articles_from_txt(filepath):
@@ -91,9 +94,10 @@ def load_articles_from_txt(filepath):
             print(f"⚠️ Skipping article due to missing link or description: {art.get('title', 'Untitled Article')}")
     return validated_articles
 
-def generate_embeddings(texts, model_name):
+def load_embedding_model(model_name):
     """
-    Generates sentence embeddings for a list of texts using SentenceTransformer.
+    Loads the SentenceTransformer model used to embed article descriptions
+    and checks that its output dimension matches the Pinecone index.
     """
     print(f"🤖 Loading embedding model: {model_name}...")
     try:
@@ -114,32 +118,30 @@ def generate_embeddings(texts, model_name):
         print("2. Find and use an embedding model that outputs exactly", EXPECTED_EMBEDDING_DIMENSION, "dimensions.")
         return None # Stop execution
 
-    print("Generating embeddings...")
-    # Using convert_to_numpy=True for direct conversion to list later
-    embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-    return embeddings
+    return model
 
-def upsert_to_pinecone(articles_data, embeddings, pinecone_api_key, pinecone_environment, index_name, batch_size):
+def connect_to_pinecone_index(embedding_model, pinecone_api_key, pinecone_environment, index_name):
     """
-    Connects to Pinecone and upserts article embeddings and metadata.
+    Connects to Pinecone and checks that the index exists and matches the
+    embedding model's dimension. Returns the Index, or None if it can't be used.
     """
     if not pinecone_api_key:
         print("❌ Pinecone API key not found in .env. Skipping Pinecone upsert.")
-        return
+        return None
 
     try:
         pc = Pinecone(api_key=pinecone_api_key, environment=pinecone_environment)
         print(f"🚀 Connected to Pinecone in environment: {pinecone_environment}")
     except Exception as e:
         print(f"❌ Error initializing Pinecone client: {e}. Skipping upsert.")
-        return
+        return None
 
     try:
         # Check if index exists and get its description
         if index_name not in pc.list_indexes().names():
             print(f"❌ Pinecone index '{index_name}' does not exist.")
             print("Please create it in your Pinecone dashboard with the correct dimension and metric.")
-            return
+            return None
 
         index = pc.Index(index_name)
         index_stats = index.describe_index_stats()
@@ -147,49 +149,38 @@ def upsert_to_pinecone(articles_data, embeddings, pinecone_api_key, pinecone_env
         print(f"Current Pinecone index stats: {index_stats}")
         
         # Verify index dimension again for safety (after model output check)
-        if index_stats.dimension != embeddings.shape[1]:
-             print(f"🚨 FATAL ERROR: Pinecone index '{index_name}' dimension ({index_stats.dimension}) does not match the generated embedding dimension ({embeddings.shape[1]}).")
+        if index_stats.dimension != embedding_model.get_sentence_embedding_dimension():
+             print(f"🚨 FATAL ERROR: Pinecone index '{index_name}' dimension ({index_stats.dimension}) does not match the embedding model dimension ({embedding_model.get_sentence_embedding_dimension()}).")
              print("Please recreate your Pinecone index with the correct dimension or select a different embedding model.")
-             return
+             return None
 
 
     except Exception as e:
         print(f"❌ Error connecting to or describing Pinecone index '{index_name}': {e}. Skipping upsert.")
-        return
-
-    vectors_to_upsert = []
-    for i, article in enumerate(articles_data):
-        # article["guid"] now holds the link, which will be the Pinecone ID
-        article_id = article["guid"]
-        vector = embeddings[i].tolist() # Convert NumPy array to Python list
-
-        # Prepare metadata: Clean keys, handle categories list
-        metadata = {
-            "channel_title": article.get("channel_title"),
-            "title": article.get("title"),
-            "link": article.get("link"), # Link is also stored in metadata
-            "publication_date": article.get("publication_date"),
-            # Parse categories string into a list of strings
-            "categories": [c.strip() for c in article.get("categories", "").split(',') if c.strip()],
-            "description_text": article.get("description") # Store original text for display
-        }
-        # Remove any metadata fields that are None or empty lists (Pinecone doesn't like None)
-        metadata = {k: v for k, v in metadata.items() if v is not None and (not isinstance(v, list) or len(v) > 0)}
+        return None
 
-        vectors_to_upsert.append((article_id, vector, metadata))
+    return index
 
-    print(f"📦 Preparing to upsert {len(vectors_to_upsert)} vectors to Pinecone in batches of {batch_size}...")
-    for i in range(0, len(vectors_to_upsert), batch_size):
-        batch = vectors_to_upsert[i:i + batch_size]
-        try:
-            index.upsert(vectors=batch)
-            print(f"✅ Upserted batch {i // batch_size + 1}/{(len(vectors_to_upsert) + batch_size - 1) // batch_size} ({len(batch)} vectors).")
-        except Exception as e:
-            print(f"❌ Error upserting batch starting at {i} (ID: {batch[0][0]}): {e}")
-            # You might want more sophisticated error handling here, like logging failed IDs
-            # or retrying specific batches.
+def embed_and_upsert(articles_data):
+    """
+    Loads the embedding model and pipelines the articles into Pinecone
+    (see pinecone_sync.upsert_to_pinecone). Returns the IDs upserted successfully.
+    """
+    embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME)
+    if embedding_model is None: # Exit if model loading failed (e.g., dimension mismatch)
+        print("Embedding model could not be loaded. Exiting.")
+        exit()
 
-    print("🎉 All eligible articles upserted to Pinecone!")
+    upsert_index = connect_to_pinecone_index(embedding_model, PINECONE_API_KEY, PINECONE_ENVIRONMENT, PINECONE_INDEX_NAME)
+    if upsert_index is None:
+        return []
+    return upsert_to_pinecone(
+        upsert_index,
+        articles_data,
+        lambda texts: embedding_model.encode(texts, convert_to_numpy=True),
+        BATCH_SIZE,
+        DEAD_LETTER_PATH
+    )
 
 # --- Main Execution ---
 if __name__ == "__main__":
@@ -208,25 +199,11 @@ if __name__ == "__main__":
     print(f"📖 Loaded {len(articles_data)} articles from {TXT_FILE_PATH}")
 
     if articles_data:
-        # Extract descriptions for embedding
-        texts_for_embeddings = [article["description"] for article in articles_data]
-
-        # Generate embeddings
-        embeddings = generate_embeddings(texts_for_embeddings, EMBEDDING_MODEL_NAME)
-        
-        if embeddings is None: # Exit if embedding generation failed (e.g., dimension mismatch)
-            print("Embedding generation failed. Exiting.")
-            exit()
-
-        # Upsert to Pinecone
-        upsert_to_pinecone(
-            articles_data,
-            embeddings,
-            PINECONE_API_KEY,
-            PINECONE_ENVIRONMENT,
-            PINECONE_INDEX_NAME,
-            BATCH_SIZE
-        )
+        manifest = load_sync_manifest(SYNC_MANIFEST_PATH)
+        # Only new, changed and dead-lettered articles are embedded (the model loads lazily in embed_and_upsert)
+        if run_delta_sync(index, articles_data, manifest, embed_and_upsert, BATCH_SIZE, DEAD_LETTER_PATH):
+            save_sync_manifest(SYNC_MANIFEST_PATH, manifest)
+            print(f"💾 Sync manifest saved to {SYNC_MANIFEST_PATH} (version {manifest['version']}, {len(manifest['articles'])} articles).")
     else:
         print("No articles found in the text file to process for Pinecone.")
 
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# === CONFIG ===
+MAX_INFLIGHT_UPSERTS = 4 # Concurrent upsert requests while the next batch is being embedded
+MAX_UPSERT_RETRIES = 3 # Retries per batch before it goes to the dead-letter file
+RETRY_BACKOFF_BASE_SECONDS = 1.0 # Backoff doubles on every retry, plus up to this much jitter
+
+# --- Delta sync manifest ---
+# The manifest records, for every article already in Pinecone, the hash of the
+# fields we embed/store and the sync run ("version") that last upserted it:
+# {"version": 3, "articles": {"<id>": {"hash": "<sha256>", "version": 2}}}
+
+def compute_article_hash(article):
+    """
+    Hashes every field that ends up in the Pinecone vector or its metadata,
+    so any edit to an article changes its hash and triggers a re-upsert.
+    """
+    hashed_fields = ["channel_title", "title", "link", "publication_date", "description", "categories"]
+    unique_string = "\x1f".join(article.get(field, "") for field in hashed_fields)
+    return hashlib.sha256(unique_string.encode('utf-8')).hexdigest()
+
+def load_sync_manifest(filepath):
+    """
+    Loads the sync manifest. A missing or unreadable manifest means nothing has
+    been synced yet, so the next run upserts every article.
+    """
+    if not os.path.exists(filepath):
+        return {"version": 0, "articles": {}}
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Warning: Could not read sync manifest '{filepath}' ({e}). Starting a full sync.")
+        return {"version": 0, "articles": {}}
+    manifest.setdefault("version", 0)
+    manifest.setdefault("articles", {})
+    return manifest
+
+def save_sync_manifest(filepath, manifest):
+    # Write to a temp file first so an interrupted run never leaves a truncated manifest
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, filepath)
+
+def plan_delta_sync(articles_data, manifest):
+    """
+    Compares the current articles against the manifest.
+    Returns (changed_articles, removed_ids, hashes): articles that are new or whose
+    content hash changed, IDs in the manifest that no longer exist in the file,
+    and the current hash of every article keyed by ID.
+    """
+    synced = manifest.get("articles", {})
+    hashes = {}
+    changed_articles = []
+    for article in articles_data:
+        article_id = article["guid"]
+        article_hash = compute_article_hash(article)
+        hashes[article_id] = article_hash
+        entry = synced.get(article_id)
+        if entry is None or entry.get("hash") != article_hash:
+            changed_articles.append(article)
+
+    removed_ids = [article_id for article_id in synced if article_id not in hashes]
+    return changed_articles, removed_ids, hashes
+
+def delete_from_pinecone(index, ids, batch_size):
+    """
+    Deletes vectors for articles that disappeared from the source file, in batches.
+    Returns the IDs that were deleted successfully.
+    """
+    deleted_ids = []
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i:i + batch_size]
+        try:
+            index.delete(ids=batch)
+            deleted_ids.extend(batch)
+            print(f"🗑️ Deleted batch {i // batch_size + 1}/{(len(ids) + batch_size - 1) // batch_size} ({len(batch)} vectors).")
+        except Exception as e:
+            print(f"❌ Error deleting batch starting at {i} (ID: {batch[0]}): {e}")
+    return deleted_ids
+
+def record_sync_results(manifest, upserted_ids, deleted_ids, hashes, sync_version):
+    """
+    Updates the manifest after a sync run. Only IDs that actually reached (or left)
+    Pinecone are recorded; failed upserts/deletes are picked up again next run.
+    """
+    for article_id in upserted_ids:
+        manifest["articles"][article_id] = {"hash": hashes[article_id], "version": sync_version}
+    for article_id in deleted_ids:
+        manifest["articles"].pop(article_id, None)
+    manifest["version"] = sync_version
+    return manifest
+
+
+# --- Dead-letter file for batches that still fail after all retries ---
+
+def load_dead_letter_ids(filepath):
+    """
+    Reads the IDs of every batch recorded in the dead-letter file (one JSON object per line).
+    """
+    if not os.path.exists(filepath):
+        return set()
+    dead_ids = set()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                dead_ids.update(json.loads(line).get("ids", []))
+            except json.JSONDecodeError:
+                print(f"⚠️ Warning: Skipping malformed dead-letter line: '{line[:80]}'")
+    return dead_ids
+
+def append_dead_letter(filepath, ids, error):
+    with open(filepath, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"failed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "error": str(error), "ids": ids}) + "\n")
+
+def prune_dead_letter(filepath, resolved_ids, current_ids):
+    """
+    Rewrites the dead-letter file after a replay, keeping only IDs that are still
+    unresolved: not upserted this run (`resolved_ids`) and still present in the
+    source file (`current_ids`). The file is removed once nothing is left.
+    """
+    if not os.path.exists(filepath):
+        return
+    entries = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue # Already reported by load_dead_letter_ids
+
+    # Newest entry first, so an ID that failed again is kept once, with its latest error
+    remaining_entries = []
+    kept_ids = set()
+    for entry in reversed(entries):
+        entry["ids"] = [
+            vector_id for vector_id in entry.get("ids", [])
+            if vector_id in current_ids and vector_id not in resolved_ids and vector_id not in kept_ids
+        ]
+        kept_ids.update(entry["ids"])
+        if entry["ids"]:
+            remaining_entries.append(entry)
+    remaining_entries.reverse()
+
+    if not remaining_entries:
+        os.remove(filepath)
+        return
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for entry in remaining_entries:
+            f.write(json.dumps(entry) + "\n")
+    os.replace(tmp_path, filepath)
+
+
+# --- Pipelined upserts ---
+
+def build_pinecone_metadata(article):
+    """
+    Prepares the metadata stored alongside each vector.
+    """
+    metadata = {
+        "channel_title": article.get("channel_title"),
+        "title": article.get("title"),
+        "link": article.get("link"), # Link is also stored in metadata
+        "publication_date": article.get("publication_date"),
+        # Parse categories string into a list of strings
+        "categories": [c.strip() for c in article.get("categories", "").split(',') if c.strip()],
+        "description_text": article.get("description") # Store original text for display
+    }
+    # Remove any metadata fields that are None or empty lists (Pinecone doesn't like None)
+    return {k: v for k, v in metadata.items() if v is not None and (not isinstance(v, list) or len(v) > 0)}
+
+def upsert_batch_with_retry(index, batch, batch_number, total_batches, max_retries=MAX_UPSERT_RETRIES):
+    """
+    Upserts one batch, retrying with exponential backoff and jitter.
+    Returns (batch_ids, error); error is None on success.
+    """
+    batch_ids = [vector_id for vector_id, _, _ in batch]
+    for attempt in range(max_retries + 1):
+        try:
+            index.upsert(vectors=batch)
+            print(f"✅ Upserted batch {batch_number}/{total_batches} ({len(batch)} vectors).")
+            return batch_ids, None
+        except Exception as e:
+            if attempt == max_retries:
+                print(f"❌ Giving up on batch {batch_number}/{total_batches} (ID: {batch_ids[0]}) after {max_retries + 1} attempts: {e}")
+                return batch_ids, e
+            delay = RETRY_BACKOFF_BASE_SECONDS * (2 ** attempt) + random.uniform(0, RETRY_BACKOFF_BASE_SECONDS)
+            print(f"⚠️ Batch {batch_number}/{total_batches} failed ({e}). Retrying in {delay:.1f}s ({attempt + 1}/{max_retries})...")
+            time.sleep(delay)
+
+def upsert_to_pinecone(index, articles_data, encode, batch_size, dead_letter_path,
+                       max_inflight=MAX_INFLIGHT_UPSERTS, max_retries=MAX_UPSERT_RETRIES):
+    """
+    Embeds and upserts articles as a pipeline: while up to `max_inflight` batches
+    are being upserted on worker threads, the main thread is already embedding
+    the next batch with `encode` (list of descriptions -> numpy array of vectors).
+    Failed batches are retried with backoff and, if they still fail, their IDs go
+    to the dead-letter file. Returns the IDs that were upserted successfully so
+    the sync manifest only records articles that actually reached the index.
+    """
+    total_batches = (len(articles_data) + batch_size - 1) // batch_size
+    print(f"📦 Embedding and upserting {len(articles_data)} articles in {total_batches} batches of {batch_size} "
+          f"({max_inflight} upserts in flight)...")
+
+    upserted_ids = []
+    failed_count = 0
+    in_flight = set()
+
+    def collect(done_futures):
+        nonlocal failed_count
+        for future in done_futures:
+            batch_ids, error = future.result()
+            if error is None:
+                upserted_ids.extend(batch_ids)
+            else:
+                failed_count += len(batch_ids)
+                append_dead_letter(dead_letter_path, batch_ids, error)
+
+    with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+        for i in range(0, len(articles_data), batch_size):
+            batch_articles = articles_data[i:i + batch_size]
+
+            # Embed batch N+1 while earlier batches are still being upserted
+            embeddings = encode([article["description"] for article in batch_articles])
+            # article["guid"] holds the link, which is the Pinecone ID
+            batch = [(article["guid"], embedding.tolist(), build_pinecone_metadata(article))
+                     for article, embedding in zip(batch_articles, embeddings)]
+
+            # Bound the pipeline so embeddings never run far ahead of the network
+            if len(in_flight) >= max_inflight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            in_flight.add(executor.submit(upsert_batch_with_retry, index, batch, i // batch_size + 1, total_batches, max_retries))
+
+        done, _ = wait(in_flight)
+        collect(done)
+
+    if failed_count:
+        print(f"⚠️ {failed_count} vectors failed to upsert. Their IDs were written to {dead_letter_path} for replay.")
+    else:
+        print("🎉 All eligible articles upserted to Pinecone!")
+    return upserted_ids
+
+
+# --- One sync run ---
+
+def run_delta_sync(index, articles_data, manifest, upsert_fn, batch_size, dead_letter_path):
+    """
+    Brings `index` in line with `articles_data`: upserts new, changed and
+    dead-lettered articles through `upsert_fn(articles) -> upserted_ids`, deletes
+    articles that left the source file, prunes the dead-letter file and records
+    the results in `manifest`. Returns False (manifest untouched) when there was
+    nothing to sync, True when the manifest should be saved.
+    """
+    changed_articles, removed_ids, article_hashes = plan_delta_sync(articles_data, manifest)
+    print(f"🔍 Delta sync: {len(changed_articles)} new/changed, {len(removed_ids)} removed, "
+          f"{len(articles_data) - len(changed_articles)} unchanged (manifest version {manifest['version']}).")
+
+    # Replay batches that failed on a previous run, even if the manifest was edited since
+    dead_letter_ids = load_dead_letter_ids(dead_letter_path)
+    if dead_letter_ids:
+        changed_ids = {article["guid"] for article in changed_articles}
+        replayed = [article for article in articles_data if article["guid"] in dead_letter_ids and article["guid"] not in changed_ids]
+        changed_articles.extend(replayed)
+        print(f"♻️ Replaying {len(dead_letter_ids)} dead-letter IDs from {dead_letter_path} ({len(replayed)} added to this run).")
+    # The dead-letter file is only rewritten once the replay has run, so an exit or crash before then keeps it
+    current_ids = {article["guid"] for article in articles_data}
+
+    if not changed_articles and not removed_ids:
+        prune_dead_letter(dead_letter_path, set(), current_ids) # Drop IDs of articles that no longer exist
+        print("Pinecone is already in sync with the text file. Nothing to do.")
+        return False
+
+    sync_version = manifest["version"] + 1
+    upserted_ids = []
+    if changed_articles:
+        upserted_ids = upsert_fn(changed_articles)
+        # Keep only dead-letter IDs that are still unresolved (including any that failed again this run)
+        prune_dead_letter(dead_letter_path, set(upserted_ids), current_ids)
+
+    deleted_ids = delete_from_pinecone(index, removed_ids, batch_size) if removed_ids else []
+
+    record_sync_results(manifest, upserted_ids, deleted_ids, article_hashes, sync_version)
+    return True
@@ -0,0 +1,57 @@
+import os
+import re
+
+# === CONFIG ===
+MODE_DIRECT = "direct" # Short answer, no reasoning preamble
+MODE_REACT = "react" # Thought/Action/Observation/Final Answer prompt
+# Force one mode for every query: "auto" (default), "direct" or "react"
+RESPONSE_MODE = os.environ.get("RESPONSE_MODE", "auto").lower()
+SIMPLE_MAX_WORDS = 14 # Longer questions usually carry several constraints worth reasoning about
+
+# A message that is nothing but a greeting or thanks
+_GREETING_PATTERN = re.compile(
+    r"\s*(hi|hello|hey|yo|gm|thanks|thank you|thx|good (morning|afternoon|evening)|bye)"
+    r"(\s+(there|kara|all|everyone|team|so much|a lot))?[\s!.,:)]*",
+    re.IGNORECASE,
+)
+# Questions about the assistant or Curate.Fun itself
+_FAQ_PATTERN = re.compile(
+    r"\b(who|what) are you\b|\bwhat can you do\b|\byour name\b"
+    r"|\bwhat('s| is) curate\.?fun\b|\bhow (do|can) i (use|join|submit|curate|contact)\b",
+    re.IGNORECASE,
+)
+# Wording that asks for comparison, causal explanation, judgement or planning
+_COMPLEX_PATTERN = re.compile(
+    r"\b(compare|comparison|versus|vs\.?|difference between|differences|pros and cons|trade-?offs?"
+    r"|why|how (does|do|did|would|could|can|should|will) (it|this|that|they|the|a|an)\b"
+    r"|explain|analy[sz]e|analysis|implications?|impact|predict|forecast|evaluate"
+    r"|should i|recommend|strategy|step[- ]by[- ]step|in detail)\b",
+    re.IGNORECASE,
+)
+
+
+def route_query(query: str):
+    """
+    Chooses the response mode for a user query with cheap local heuristics.
+    Returns (mode, reason). Comparisons, "why"/"explain" questions, multi-part
+    and long questions keep the structured reasoning prompt; bare greetings,
+    FAQ and short single questions get a direct answer.
+    """
+    if RESPONSE_MODE in (MODE_DIRECT, MODE_REACT):
+        return RESPONSE_MODE, "forced by RESPONSE_MODE"
+
+    text = (query or "").strip()
+    if not text:
+        return MODE_DIRECT, "empty query"
+    # Complex wording wins over everything else, even after a leading "hi"
+    if _COMPLEX_PATTERN.search(text):
+        return MODE_REACT, "complex wording"
+    if _GREETING_PATTERN.fullmatch(text):
+        return MODE_DIRECT, "greeting"
+    if _FAQ_PATTERN.search(text):
+        return MODE_DIRECT, "FAQ"
+    if text.count("?") > 1:
+        return MODE_REACT, "multiple questions"
+    if len(text.split()) > SIMPLE_MAX_WORDS:
+        return MODE_REACT, "long query"
+    return MODE_DIRECT, "short single question"
@@ -1,24 +1,27 @@
 # M:\volunteering\Curate.Fun\chatbot\Backend\retriever_module.py
 
+from __future__ import annotations
+
 import os
+import gc
 import pickle
+import threading
+from typing import TYPE_CHECKING
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings # For Mixedbread AI embeddings
-from langchain.schema import Document # Needed for type hinting Document objects
-from rank_bm25 import BM25Okapi # Needed for BM25 type hinting
 from dotenv import load_dotenv
-from nltk import word_tokenize
-import nltk
 import json # Added for parsing LLM's strategy decision
-from openai import OpenAI # Added for type hinting and using LLM client
-
-# NLTK Punkt tokenizer download (ensure this runs once)
-try:
-    nltk.data.find('tokenizers/punkt')
-except nltk.downloader.DownloadError:
-    nltk.download('punkt')
+from context_builder import build_context, CONTEXT_TOKEN_BUDGET
+from metadata_index import MetadataIndex, validate_filters, FILTER_KEYS
+from metrics import timed_stage
+from lexical_tokenizer import LexicalTokenizer
+
+# Heavy dependencies (sklearn, langchain, FAISS, sentence-transformers) are imported
+# on first use, so importing this module stays cheap for processes that never retrieve.
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.embeddings import HuggingFaceEmbeddings # For Mixedbread AI embeddings
+    from langchain.schema import Document # Needed for type hinting Document objects
+    from rank_bm25 import BM25Okapi # Needed for BM25 type hinting
 
 # Load environment variables
 load_dotenv()
@@ -26,12 +29,19 @@ load_dotenv()
 # Define paths (must match prepare_knowledge_base.py)
 FAISS_DB_PATH = "db/faiss_index"
 BM25_INDEX_PATH = "db/bm25_index.pkl"
+LEXICAL_TOKENIZER_PATH = "db/lexical_tokenizer.pkl"
 ALL_DOCS_PATH = os.path.join("db", "all_article_docs.pkl")
+PASSAGES_PATH = os.path.join("db", "article_passages.pkl")
+METADATA_INDEX_PATH = os.path.join("db", "metadata_index.pkl")
 
 # Configuration Constants for RAG
 K_RETRIEVAL = 10 # Number of articles to retrieve from each method (FAISS, BM25)
 RRF_K_CONSTANT = 60 # Constant for Reciprocal Rank Fusion
-K_FINAL_CONTEXT = 5 # Limit to top N articles for LLM context after fusion and deduplication
+# Set RAG_QUERY_TIME_NEAR_DEDUP=0 only when db/ was built from ingest output collapsed by near_duplicates.py;
+# articles ingested before that (or loaded from elsewhere) still need near-duplicate removal per query
+QUERY_TIME_NEAR_DEDUP = os.environ.get("RAG_QUERY_TIME_NEAR_DEDUP", "1") == "1"
+K_FINAL_CONTEXT = 5 # Limit to top N articles whose passages compete for the LLM context budget
+WARMUP_QUERY = "latest crypto news" # Run once at startup so the first user query doesn't pay for lazy initialization
 
 # --- Helper functions (remain here for retrieval logic) ---
 
@@ -58,11 +68,12 @@ def reciprocal_rank_fusion(ranked_lists, k=RRF_K_CONSTANT):
         final_results.append((doc_map[doc_key], score))
     return final_results
 
-def deduplicate_chunks(ranked_chunks_with_scores, embeddings_model, similarity_threshold=0.98, verbose=False):
+def deduplicate_chunks(ranked_chunks_with_scores, embeddings_model, similarity_threshold=0.98, near_duplicates=True, verbose=False):
     """
     Deduplicates a list of ranked document chunks based on semantic similarity.
     Removes exact and near-duplicate chunks to provide cleaner context to the LLM,
-    reducing redundancy and token usage.
+    reducing redundancy and token usage. With near_duplicates=False only exact
+    duplicates are removed, which skips embedding every chunk.
     """
     if not ranked_chunks_with_scores:
         return []
@@ -83,6 +94,11 @@ def deduplicate_chunks(ranked_chunks_with_scores, embeddings_model, similarity_t
                 print(f"    Skipping exact duplicate: {current_content[:50]}...")
             continue
 
+        if not near_duplicates:
+            deduplicated_results.append((current_doc, current_score))
+            processed_contents.add(current_content)
+            continue
+
         # 2. Generate embedding for the current chunk to check for near-duplicates
         current_embedding = embeddings_model.embed_query(current_content)
         is_near_duplicate = False
@@ -90,6 +106,7 @@ def deduplicate_chunks(ranked_chunks_with_scores, embeddings_model, similarity_t
             current_embedding_np = np.array(current_embedding).reshape(1, -1)
             processed_embeddings_np = np.array(processed_embeddings)
             # Calculate cosine similarity with all already processed unique embeddings
+            from sklearn.metrics.pairwise import cosine_similarity
             similarities = cosine_similarity(current_embedding_np, processed_embeddings_np)[0]
             if np.max(similarities) > similarity_threshold:
                 is_near_duplicate = True
@@ -110,15 +127,41 @@ def deduplicate_chunks(ranked_chunks_with_scores, embeddings_model, similarity_t
 # --- Class to hold retriever instances and their associated data ---
 class RetrieverManager:
     """
-    Manages the initialized FAISS vector store, BM25 lexical index,
-    the list of documents (full articles), and the embeddings model.
+    Manages the initialized FAISS vector store, BM25 lexical index and the
+    tokenizer (vocabulary) it was built with, the list of documents (full articles), the embeddings model, the
+    per-article passages used to assemble token-budgeted context, and the
+    metadata index used to pre-filter searches by channel, category and date.
     This class acts as a container for all components needed for retrieval.
     """
-    def __init__(self, faiss_db: FAISS, bm25_index: BM25Okapi, all_docs: list[Document], embeddings_model: HuggingFaceEmbeddings):
+    def __init__(self, faiss_db: FAISS, bm25_index: BM25Okapi, lexical_tokenizer: LexicalTokenizer, all_docs: list[Document], embeddings_model: HuggingFaceEmbeddings, passages_by_article: dict | None = None, metadata_index: MetadataIndex | None = None):
         self.faiss_db = faiss_db
         self.bm25_index = bm25_index
+        self.lexical_tokenizer = lexical_tokenizer # Same normalization and term IDs as the BM25 corpus
         self.all_docs = all_docs # Full list of all article documents
         self.embeddings_model = embeddings_model
+        self.passages_by_article = passages_by_article or {} # Article key -> list of passages
+        self.metadata_index = metadata_index # Channel/category/date posting lists over all_docs positions
+
+def load_faiss_store(folder_path, embeddings_model):
+    """
+    Loads a FAISS store saved by FAISS.save_local, memory-mapping index.faiss where
+    the installed faiss supports it. A mapped index is backed by the page cache, so
+    forked server workers share its pages instead of each holding a private copy.
+    """
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None) or getattr(faiss, "IO_FLAG_MMAP", None)
+    if mmap_flag is None:
+        return FAISS.load_local(folder_path, embeddings_model, allow_dangerous_deserialization=True)
+
+    try:
+        index = faiss.read_index(os.path.join(folder_path, "index.faiss"), mmap_flag)
+    except RuntimeError:
+        # Index types without mmap support are read into memory as before
+        index = faiss.read_index(os.path.join(folder_path, "index.faiss"))
+    with open(os.path.join(folder_path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings_model, index, docstore, index_to_docstore_id)
 
 # --- Initialization function to return RetrieverManager instance (LOADS ONLY) ---
 def initialize_retrievers(verbose=True) -> RetrieverManager:
@@ -130,22 +173,17 @@ def initialize_retrievers(verbose=True) -> RetrieverManager:
     if verbose:
         print("\n--- Initializing RAG Retriever Module ---")
 
-    # Initialize Embeddings model (needed for FAISS.load_local and deduplication)
-    if verbose:
-        print("Initializing Mixedbread AI Embeddings model (mxbai-embed-large-v1) for retrieval...")
-    _embeddings_model = HuggingFaceEmbeddings(model_name="mixedbread-ai/mxbai-embed-large-v1")
-    if verbose:
-        print("Embeddings model initialized.")
-
     # Check if all components exist on disk to load them
     faiss_db_exists = os.path.exists(FAISS_DB_PATH) and os.path.isdir(FAISS_DB_PATH)
     bm25_index_exists = os.path.exists(BM25_INDEX_PATH) and os.path.getsize(BM25_INDEX_PATH) > 0 # Check size > 0
+    lexical_tokenizer_exists = os.path.exists(LEXICAL_TOKENIZER_PATH) and os.path.getsize(LEXICAL_TOKENIZER_PATH) > 0
     all_docs_exists = os.path.exists(ALL_DOCS_PATH) and os.path.getsize(ALL_DOCS_PATH) > 0 # Check size > 0
 
-    if not (faiss_db_exists and bm25_index_exists and all_docs_exists):
+    if not (faiss_db_exists and bm25_index_exists and lexical_tokenizer_exists and all_docs_exists):
         missing_components = []
         if not faiss_db_exists: missing_components.append(f"FAISS index ({FAISS_DB_PATH})")
         if not bm25_index_exists: missing_components.append(f"BM25 index ({BM25_INDEX_PATH})")
+        if not lexical_tokenizer_exists: missing_components.append(f"Lexical tokenizer ({LEXICAL_TOKENIZER_PATH})")
         if not all_docs_exists: missing_components.append(f"All article documents ({ALL_DOCS_PATH})")
         
         error_message = (
@@ -156,10 +194,19 @@ def initialize_retrievers(verbose=True) -> RetrieverManager:
         print(error_message)
         raise FileNotFoundError(error_message)
 
+    # Initialize Embeddings model (needed for FAISS.load_local and deduplication)
+    # only once the indexes are known to exist, so a missing db/ fails fast
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    if verbose:
+        print("Initializing Mixedbread AI Embeddings model (mxbai-embed-large-v1) for retrieval...")
+    _embeddings_model = HuggingFaceEmbeddings(model_name="mixedbread-ai/mxbai-embed-large-v1")
+    if verbose:
+        print("Embeddings model initialized.")
+
     try:
         if verbose:
             print(f"Loading FAISS index from {FAISS_DB_PATH}...")
-        _faiss_db = FAISS.load_local(FAISS_DB_PATH, _embeddings_model, allow_dangerous_deserialization=True)
+        _faiss_db = load_faiss_store(FAISS_DB_PATH, _embeddings_model)
         if verbose:
             print("FAISS index loaded.")
 
@@ -167,8 +214,10 @@ def initialize_retrievers(verbose=True) -> RetrieverManager:
             print(f"Loading BM25 lexical index from {BM25_INDEX_PATH}...")
         with open(BM25_INDEX_PATH, 'rb') as f:
             _bm25_index = pickle.load(f)
+        with open(LEXICAL_TOKENIZER_PATH, 'rb') as f:
+            _lexical_tokenizer = pickle.load(f)
         if verbose:
-            print("BM25 lexical index loaded.")
+            print(f"BM25 lexical index loaded ({len(_lexical_tokenizer.vocabulary)} distinct terms).")
         
         if verbose:
             print(f"Loading all article documents from {ALL_DOCS_PATH}...")
@@ -177,6 +226,31 @@ def initialize_retrievers(verbose=True) -> RetrieverManager:
         if verbose:
             print("All article documents loaded.")
 
+        # Passages are optional: indexes built before they existed are split on the fly
+        _passages_by_article = {}
+        if os.path.exists(PASSAGES_PATH) and os.path.getsize(PASSAGES_PATH) > 0:
+            if verbose:
+                print(f"Loading article passages from {PASSAGES_PATH}...")
+            with open(PASSAGES_PATH, 'rb') as f:
+                _passages_by_article = pickle.load(f)
+            if verbose:
+                print("Article passages loaded.")
+        elif verbose:
+            print(f"No article passages found at {PASSAGES_PATH}. Passages will be split at query time.")
+
+        # The metadata index is cheap to rebuild, so fall back to building it from the documents
+        if os.path.exists(METADATA_INDEX_PATH) and os.path.getsize(METADATA_INDEX_PATH) > 0:
+            if verbose:
+                print(f"Loading metadata index from {METADATA_INDEX_PATH}...")
+            with open(METADATA_INDEX_PATH, 'rb') as f:
+                _metadata_index = pickle.load(f)
+        else:
+            if verbose:
+                print(f"No metadata index found at {METADATA_INDEX_PATH}. Building it from the loaded documents...")
+            _metadata_index = MetadataIndex.from_documents(_all_docs)
+        if verbose:
+            print("Metadata index ready.")
+
     except Exception as e:
         error_message = (
             f"❌ RAG Initialization Failed: Error loading existing indexes. "
@@ -188,118 +262,205 @@ def initialize_retrievers(verbose=True) -> RetrieverManager:
 
     if verbose:
         print("--- RAG Retriever Module Initialized Successfully ---")
-    return RetrieverManager(_faiss_db, _bm25_index, _all_docs, _embeddings_model)
+    return RetrieverManager(_faiss_db, _bm25_index, _lexical_tokenizer, _all_docs, _embeddings_model, _passages_by_article, _metadata_index)
 
 
-# --- Main RAG Context Retrieval Function ---
-def retrieve_context(query: str, retriever_manager: RetrieverManager, retrieval_strategy: str = "hybrid", verbose=False) -> str:
+# --- Search legs (optionally restricted to a pre-filtered subset of doc ids) ---
+def semantic_search(query: str, retriever_manager: RetrieverManager, doc_ids=None, k=K_RETRIEVAL):
     """
-    Retrieves relevant article documents based on the specified retrieval strategy.
-    Strategies: "semantic", "lexical", "hybrid".
+    FAISS semantic search. When `doc_ids` is given, only those vectors are
+    reconstructed and scored, so the cost scales with the subset, not the corpus.
+    """
+    if doc_ids is not None and len(doc_ids) == 0:
+        return []
+    with timed_stage("query_embedding"):
+        query_embedding = retriever_manager.embeddings_model.embed_query(query)
+    return semantic_search_by_vector(query_embedding, retriever_manager, doc_ids, k)
+
+def semantic_search_by_vector(query_embedding, retriever_manager: RetrieverManager, doc_ids=None, k=K_RETRIEVAL):
+    """
+    semantic_search with a precomputed query embedding (shard workers receive the
+    embedding from the coordinator and never load the embeddings model).
     """
     faiss_db = retriever_manager.faiss_db
+    if doc_ids is not None and len(doc_ids) == 0:
+        return []
+    with timed_stage("faiss_search"):
+        if doc_ids is None:
+            results_with_distances = faiss_db.similarity_search_with_score_by_vector(query_embedding, k=k)
+        else:
+            query_vector = np.array(query_embedding, dtype=np.float32)
+            subset_vectors = faiss_db.index.reconstruct_batch(np.asarray(doc_ids, dtype=np.int64))
+            # Squared L2, matching the distances returned by the default FAISS (IndexFlatL2) store
+            distances = np.sum((subset_vectors - query_vector) ** 2, axis=1)
+            top = np.argsort(distances)[:k]
+            results_with_distances = [
+                (faiss_db.docstore.search(faiss_db.index_to_docstore_id[int(doc_ids[i])]), float(distances[i]))
+                for i in top
+            ]
+    # Convert distance to a similarity-like score
+    return [(doc, 1.0 / (distance + 1e-5)) for doc, distance in results_with_distances]
+
+def lexical_search(query: str, retriever_manager: RetrieverManager, doc_ids=None, k=K_RETRIEVAL):
+    """
+    BM25 lexical search. When `doc_ids` is given, only those documents are scored.
+    """
     bm25_index = retriever_manager.bm25_index
+    all_docs = retriever_manager.all_docs # BM25 corpus positions match all_docs positions
+    with timed_stage("bm25_search"):
+        tokenized_query_for_bm25 = retriever_manager.lexical_tokenizer.encode_query(query)
+        if doc_ids is None:
+            doc_scores = bm25_index.get_scores(tokenized_query_for_bm25)
+            candidates = zip(doc_scores, all_docs)
+        else:
+            doc_ids = [int(doc_id) for doc_id in doc_ids]
+            doc_scores = bm25_index.get_batch_scores(tokenized_query_for_bm25, doc_ids) if doc_ids else []
+            candidates = zip(doc_scores, (all_docs[doc_id] for doc_id in doc_ids))
+        scored_docs_bm25 = sorted(candidates, key=lambda x: x[0], reverse=True)
+    return [(doc, score) for score, doc in scored_docs_bm25[:k]]
+
+
+# --- Main RAG Context Retrieval Function ---
+def retrieve_context(query: str, retriever_manager: RetrieverManager, retrieval_strategy: str = "hybrid", token_budget: int = CONTEXT_TOKEN_BUDGET, return_token_count=False, filters: dict | None = None, verbose=False):
+    """
+    Retrieves relevant article documents based on the specified retrieval strategy
+    and assembles the best passages of the top articles into a context string
+    that fits within `token_budget` (approximate) tokens.
+    Strategies: "semantic", "lexical", "hybrid".
+    `filters` optionally restricts search to a metadata subset before scoring, e.g.
+    {"channels": ["Solana"], "categories": ["defi"], "since": "2025-06-01", "until": None}.
+    Unknown filter keys are ignored with a warning; unparseable since/until dates raise ValueError.
+    Returns the context string, or (context_string, tokens_used) if return_token_count is True.
+    """
     embeddings_model = retriever_manager.embeddings_model
-    all_docs = retriever_manager.all_docs # Full list of all article documents for BM25 lookup
 
     if verbose:
         print(f"Starting RAG context retrieval for query: '{query}' with strategy: '{retrieval_strategy}'")
 
-    retrieved_docs_with_scores = []
-
-    if retrieval_strategy == "semantic":
-        # 1. Semantic Search (FAISS)
-        if verbose:
-            print(f"    Performing semantic search for top {K_RETRIEVAL} articles...")
-        semantic_results_with_distances = faiss_db.similarity_search_with_score(query, k=K_RETRIEVAL)
-        for doc, distance in semantic_results_with_distances:
-            similarity_score = 1.0 / (distance + 1e-5) # Convert distance to a similarity-like score
-            retrieved_docs_with_scores.append((doc, similarity_score))
-        if verbose:
-            print(f"    Semantic search found {len(retrieved_docs_with_scores)} results.")
+    doc_ids = None
+    if filters:
+        filters, unknown_keys = validate_filters(filters)
+        if unknown_keys:
+            print(f"WARNING: Ignoring unknown metadata filter keys {unknown_keys}. Supported keys: {', '.join(FILTER_KEYS)}.")
+    if filters:
+        if retriever_manager.metadata_index is None:
+            print("WARNING: Metadata filters requested but no metadata index is loaded. Searching the whole corpus.")
+        else:
+            with timed_stage("metadata_filter"):
+                doc_ids = retriever_manager.metadata_index.filter_doc_ids(**filters)
+            if verbose and doc_ids is not None:
+                print(f"    Metadata filters {filters} matched {len(doc_ids)}/{len(retriever_manager.all_docs)} articles.")
+
+    if retrieval_strategy not in ("semantic", "lexical", "hybrid"):
+        print(f"WARNING: Unknown retrieval strategy '{retrieval_strategy}'. Defaulting to 'hybrid'.")
+        retrieval_strategy = "hybrid"
 
-    elif retrieval_strategy == "lexical":
-        # 2. Lexical Search (BM25)
-        if verbose:
-            print(f"    Performing lexical search for top {K_RETRIEVAL} articles using BM25...")
-        tokenized_query_for_bm25 = word_tokenize(query.lower())
-        doc_scores = bm25_index.get_scores(tokenized_query_for_bm25)
-        
-        scored_docs_bm25 = sorted(zip(doc_scores, all_docs), key=lambda x: x[0], reverse=True)
-        retrieved_docs_with_scores = [(doc, score) for score, doc in scored_docs_bm25[:K_RETRIEVAL]]
-        if verbose:
-            print(f"    Lexical search found {len(retrieved_docs_with_scores)} results.")
+    semantic_ranked, lexical_ranked = [], []
 
-    elif retrieval_strategy == "hybrid":
+    if retrieval_strategy in ("semantic", "hybrid"):
         # 1. Semantic Search (FAISS)
         if verbose:
             print(f"    Performing semantic search for top {K_RETRIEVAL} articles...")
-        semantic_results_with_distances = faiss_db.similarity_search_with_score(query, k=K_RETRIEVAL)
-        semantic_ranked = []
-        for doc, distance in semantic_results_with_distances:
-            similarity_score = 1.0 / (distance + 1e-5)
-            semantic_ranked.append((doc, similarity_score))
+        semantic_ranked = semantic_search(query, retriever_manager, doc_ids)
         if verbose:
             print(f"    Semantic search found {len(semantic_ranked)} results.")
 
+    if retrieval_strategy in ("lexical", "hybrid"):
         # 2. Lexical Search (BM25)
         if verbose:
             print(f"    Performing lexical search for top {K_RETRIEVAL} articles using BM25...")
-        tokenized_query_for_bm25 = word_tokenize(query.lower())
-        doc_scores = bm25_index.get_scores(tokenized_query_for_bm25)
-        
-        scored_docs_bm25 = sorted(zip(doc_scores, all_docs), key=lambda x: x[0], reverse=True)
-        lexical_ranked = [(doc, score) for score, doc in scored_docs_bm25[:K_RETRIEVAL]]
+        lexical_ranked = lexical_search(query, retriever_manager, doc_ids)
         if verbose:
             print(f"    Lexical search found {len(lexical_ranked)} results.")
 
+    return assemble_context(
+        query,
+        semantic_ranked,
+        lexical_ranked,
+        embeddings_model,
+        retriever_manager.passages_by_article,
+        retrieval_strategy=retrieval_strategy,
+        token_budget=token_budget,
+        return_token_count=return_token_count,
+        verbose=verbose
+    )
+
+def assemble_context(query: str, semantic_ranked, lexical_ranked, embeddings_model, passages_by_article: dict, retrieval_strategy: str = "hybrid", token_budget: int = CONTEXT_TOKEN_BUDGET, return_token_count=False, verbose=False):
+    """
+    Fuses the ranked legs (RRF for the "hybrid" strategy), deduplicates, and fills the
+    token budget with the best passages of the top K_FINAL_CONTEXT articles.
+    Shared by retrieve_context and the sharded coordinator (sharded_retrieval.py).
+    """
+    if retrieval_strategy == "hybrid":
         # 3. Hybrid Search (RRF Fusion)
         if verbose:
             print("    Fusing semantic and lexical search results using RRF...")
-        retrieved_docs_with_scores = reciprocal_rank_fusion([semantic_ranked, lexical_ranked], k=RRF_K_CONSTANT)
+        with timed_stage("rrf"):
+            retrieved_docs_with_scores = reciprocal_rank_fusion([semantic_ranked, lexical_ranked], k=RRF_K_CONSTANT)
         if verbose:
             print(f"    Hybrid search (fused) found {len(retrieved_docs_with_scores)} results before deduplication.")
     else:
-        print(f"WARNING: Unknown retrieval strategy '{retrieval_strategy}'. Defaulting to 'hybrid'.")
-        # Fallback to hybrid if an invalid strategy is provided
-        # This block is a copy of the 'hybrid' logic to ensure it runs
-        if verbose:
-            print(f"    Performing semantic search for top {K_RETRIEVAL} articles...")
-        semantic_results_with_distances = faiss_db.similarity_search_with_score(query, k=K_RETRIEVAL)
-        semantic_ranked = []
-        for doc, distance in semantic_results_with_distances:
-            similarity_score = 1.0 / (distance + 1e-5)
-            semantic_ranked.append((doc, similarity_score))
-        if verbose:
-            print(f"    Semantic search found {len(semantic_ranked)} results.")
-
-        if verbose:
-            print(f"    Performing lexical search for top {K_RETRIEVAL} articles using BM25...")
-        tokenized_query_for_bm25 = word_tokenize(query.lower())
-        doc_scores = bm25_index.get_scores(tokenized_query_for_bm25)
-        
-        scored_docs_bm25 = sorted(zip(doc_scores, all_docs), key=lambda x: x[0], reverse=True)
-        lexical_ranked = [(doc, score) for score, doc in scored_docs_bm25[:K_RETRIEVAL]]
-        if verbose:
-            print(f"    Lexical search found {len(lexical_ranked)} results.")
-
-        if verbose:
-            print("    Fusing semantic and lexical search results using RRF...")
-        retrieved_docs_with_scores = reciprocal_rank_fusion([semantic_ranked, lexical_ranked], k=RRF_K_CONSTANT)
-        if verbose:
-            print(f"    Hybrid search (fused) found {len(retrieved_docs_with_scores)} results before deduplication.")
-
+        retrieved_docs_with_scores = semantic_ranked if retrieval_strategy == "semantic" else lexical_ranked
 
     # 4. Deduplicate Fused/Selected Results
     if verbose:
         print("    Deduplicating selected search results...")
-    deduplicated_final_results = deduplicate_chunks(retrieved_docs_with_scores, embeddings_model, similarity_threshold=0.98, verbose=verbose)
+    with timed_stage("dedup"):
+        deduplicated_final_results = deduplicate_chunks(retrieved_docs_with_scores, embeddings_model, similarity_threshold=0.98, near_duplicates=QUERY_TIME_NEAR_DEDUP, verbose=verbose)
     if verbose:
         print(f"    Final results after deduplication: {len(deduplicated_final_results)} articles.")
 
-    # Apply final cutoff (K_FINAL_CONTEXT) and combine content into a single string
-    context_string = "\n\n---\n\n".join([doc.page_content for doc, _ in deduplicated_final_results[:K_FINAL_CONTEXT]])
+    # Apply final cutoff (K_FINAL_CONTEXT) and fill the token budget with the best passages
+    with timed_stage("context_build"):
+        context_string, tokens_used = build_context(
+            query,
+            deduplicated_final_results[:K_FINAL_CONTEXT],
+            passages_by_article,
+            token_budget=token_budget
+        )
     
     if verbose:
-        print("RAG context retrieval complete.")
+        print(f"RAG context retrieval complete. Context uses ~{tokens_used}/{token_budget} tokens.")
+    if return_token_count:
+        return context_string, tokens_used
     return context_string
+
+
+# --- Process-wide RetrieverManager (loaded once, shared by forked workers) ---
+_retriever_manager = None
+_retriever_manager_lock = threading.Lock()
+
+def get_retriever_manager(verbose=False) -> RetrieverManager:
+    """
+    Returns the process-wide RetrieverManager, loading it on first use.
+    When called in a server's master process before workers are forked, the model
+    weights and indexes are shared with every worker copy-on-write.
+    """
+    global _retriever_manager
+    if _retriever_manager is None:
+        with _retriever_manager_lock:
+            if _retriever_manager is None:
+                _retriever_manager = initialize_retrievers(verbose=verbose)
+    return _retriever_manager
+
+def warmup(query: str = WARMUP_QUERY, verbose=True) -> RetrieverManager:
+    """
+    Loads the retrievers and runs one full retrieval so lazy imports, model
+    kernels and index pages are all touched before real traffic arrives.
+    Long-lived objects are then moved out of the garbage collector's reach
+    (gc.freeze), so collections in forked workers don't write to - and thereby
+    un-share - the pages holding them.
+    """
+    retriever_manager = get_retriever_manager(verbose=verbose)
+    if verbose:
+        print(f"🔥 Warming up retrieval with query: '{query}'")
+    retrieve_context(query, retriever_manager)
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    if verbose:
+        print("✅ Retrieval warmup complete.")
+    return retriever_manager
+
+def is_ready() -> bool:
+    return _retriever_manager is not None
@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import signal
+import argparse
+
+# === CONFIG ===
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_BASE_PORT = 5000 # Worker i listens on DEFAULT_BASE_PORT + i; put a load balancer with sticky sessions in front (Socket.IO polling needs them)
+DEFAULT_WORKERS = 2
+RESTART_DELAY_SECONDS = 1.0 # Pause before re-forking a worker that died
+PRODUCTION_ASYNC_MODES = ("eventlet", "gevent") # Flask-SocketIO picks one of these automatically when installed
+
+
+class _ShutdownRequested(Exception):
+    """
+    Raised from the SIGTERM/SIGINT handler. A handler that only set a flag would
+    never be noticed: os.waitpid is retried automatically after signals (PEP 475).
+    """
+
+
+# === SERVER ===
+
+def check_async_mode(socketio, allow_werkzeug):
+    """
+    Makes sure the workers get a production server. Flask-SocketIO uses eventlet
+    or gevent when installed and otherwise falls back to Werkzeug's development
+    server, which it refuses to run unless explicitly allowed. Returns the value
+    to pass as allow_unsafe_werkzeug.
+    """
+    async_mode = socketio.server.eio.async_mode
+    if async_mode in PRODUCTION_ASYNC_MODES:
+        print(f"✅ Serving Socket.IO with {async_mode}.")
+        return False
+    if not allow_werkzeug:
+        raise SystemExit(
+            f"❌ Neither {' nor '.join(PRODUCTION_ASYNC_MODES)} is installed, so workers would run Werkzeug's development server. "
+            "Install one (e.g. `pip install eventlet`), or pass --allow-werkzeug to use the development server anyway."
+        )
+    print("⚠️ Warning: Running on Werkzeug's development server (--allow-werkzeug). Install eventlet or gevent for production.")
+    return True
+
+def run_app(host, port, allow_unsafe_werkzeug):
+    from app import app, socketio
+    socketio.run(app, host=host, port=port, allow_unsafe_werkzeug=allow_unsafe_werkzeug)
+
+
+# === WORKERS ===
+
+def run_worker(host, port, allow_unsafe_werkzeug):
+    """
+    Child process: serves the already-imported app. Everything loaded by the
+    master (model weights, mmap'd FAISS index, BM25, documents) is inherited
+    through fork and shared copy-on-write with the other workers.
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM, signal.SIGINT})
+    print(f"👷 Worker {os.getpid()} serving on http://{host}:{port}")
+    run_app(host, port, allow_unsafe_werkzeug)
+    os._exit(0)
+
+def spawn_worker(host, port, workers, allow_unsafe_werkzeug):
+    """
+    Forks a worker and records it in `workers` (pid -> port). Shutdown signals are
+    blocked meanwhile, so a worker can't be forked without being recorded (and
+    stopped on shutdown), and the child can't run the master's handler.
+    """
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM, signal.SIGINT})
+    try:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(host, port, allow_unsafe_werkzeug)
+            finally:
+                os._exit(1)
+        workers[pid] = port
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM, signal.SIGINT})
+
+def _request_shutdown(signum, frame):
+    raise _ShutdownRequested()
+
+def run_master(host, base_port, num_workers, allow_werkzeug=False):
+    """
+    Loads and warms up everything once, then forks `num_workers` workers and
+    re-forks any that exit until SIGTERM/SIGINT.
+    """
+    start = time.perf_counter()
+    import app # Heavy imports and the RAG warmup happen here, before the fork
+    allow_unsafe_werkzeug = check_async_mode(app.socketio, allow_werkzeug)
+    app.prepare_for_serving()
+    print(f"🚀 Master {os.getpid()} ready in {time.perf_counter() - start:.1f}s. Forking {num_workers} workers...")
+
+    workers = {}
+    signal.signal(signal.SIGTERM, _request_shutdown)
+    signal.signal(signal.SIGINT, _request_shutdown)
+    try:
+        for i in range(num_workers):
+            spawn_worker(host, base_port + i, workers, allow_unsafe_werkzeug)
+
+        while workers:
+            pid, status = os.waitpid(-1, 0)
+            port = workers.pop(pid, None)
+            if port is None:
+                continue
+            print(f"⚠️ Warning: Worker {pid} on port {port} exited with status {status}. Restarting...")
+            time.sleep(RESTART_DELAY_SECONDS)
+            spawn_worker(host, port, workers, allow_unsafe_werkzeug)
+    except _ShutdownRequested:
+        pass
+    finally:
+        # Ignore repeated signals while the workers are stopped
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        print("🛑 Shutting down workers...")
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preforking server: loads the app and RAG indexes once, then forks workers that share them copy-on-write.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--base-port", type=int, default=DEFAULT_BASE_PORT, help="Worker i listens on base-port + i")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--allow-werkzeug", action="store_true", help="Run on Werkzeug's development server when neither eventlet nor gevent is installed")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        # No fork on Windows: fall back to a single process with the same warmup
+        print("⚠️ Warning: os.fork is not available on this platform. Running a single worker.")
+        import app
+        allow_unsafe_werkzeug = check_async_mode(app.socketio, args.allow_werkzeug)
+        app.prepare_for_serving()
+        run_app(args.host, args.base_port, allow_unsafe_werkzeug)
+        sys.exit(0)
+
+    if args.workers > 1 and not os.environ.get("SOCKETIO_MESSAGE_QUEUE"):
+        print("⚠️ Warning: SOCKETIO_MESSAGE_QUEUE is not set, so broadcasts only reach clients of the same worker.")
+    run_master(args.host, args.base_port, args.workers, args.allow_werkzeug)
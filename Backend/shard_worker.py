@@ -0,0 +1,138 @@
+import os
+import pickle
+import logging
+import argparse
+import threading
+from multiprocessing.connection import Listener
+from rag import (
+    RetrieverManager, load_faiss_store, semantic_search_by_vector, lexical_search, K_RETRIEVAL,
+    FAISS_DB_PATH, BM25_INDEX_PATH, LEXICAL_TOKENIZER_PATH, ALL_DOCS_PATH, PASSAGES_PATH, METADATA_INDEX_PATH,
+)
+from context_builder import article_key
+from metadata_index import MetadataIndex
+
+# === CONFIG ===
+DEFAULT_HOST = "127.0.0.1" # Bind to loopback unless the shard is meant to be reached from other machines
+
+
+# === LOADING ===
+
+def shard_path(shard_dir, db_path):
+    """
+    A shard directory holds the same files as db/, under the same names.
+    """
+    return os.path.join(shard_dir, os.path.basename(db_path))
+
+def load_shard(shard_dir, verbose=True) -> RetrieverManager:
+    """
+    Loads one shard's FAISS index, BM25 index, documents, passages and metadata index.
+    No embeddings model is loaded: the coordinator embeds each query once and sends
+    the vector, so a shard worker only holds its slice of the corpus.
+    """
+    if verbose:
+        print(f"📦 Loading shard from {shard_dir}...")
+    # langchain warns when a FAISS store has no embeddings object; searches here are always by vector
+    logging.getLogger("langchain_community.vectorstores.faiss").setLevel(logging.ERROR)
+    faiss_db = load_faiss_store(shard_path(shard_dir, FAISS_DB_PATH), None)
+    with open(shard_path(shard_dir, BM25_INDEX_PATH), 'rb') as f:
+        bm25_index = pickle.load(f)
+    with open(shard_path(shard_dir, LEXICAL_TOKENIZER_PATH), 'rb') as f:
+        lexical_tokenizer = pickle.load(f)
+    with open(shard_path(shard_dir, ALL_DOCS_PATH), 'rb') as f:
+        all_docs = pickle.load(f)
+    with open(shard_path(shard_dir, PASSAGES_PATH), 'rb') as f:
+        passages_by_article = pickle.load(f)
+    metadata_index_path = shard_path(shard_dir, METADATA_INDEX_PATH)
+    if os.path.exists(metadata_index_path):
+        with open(metadata_index_path, 'rb') as f:
+            metadata_index = pickle.load(f)
+    else:
+        metadata_index = MetadataIndex.from_documents(all_docs)
+    if verbose:
+        print(f"✅ Shard {shard_dir} loaded ({len(all_docs)} articles).")
+    return RetrieverManager(faiss_db, bm25_index, lexical_tokenizer, all_docs, None, passages_by_article, metadata_index)
+
+
+# === REQUEST HANDLING ===
+
+def handle_request(retriever_manager: RetrieverManager, request: dict) -> dict:
+    """
+    Serves one coordinator request against this shard:
+      {"op": "ping"}
+      {"op": "search", "query": str, "query_embedding": list | None, "lexical": bool, "filters": dict | None, "k": int}
+    Search returns this shard's top-k per leg and the passages of every returned article.
+    """
+    op = request.get("op")
+    if op == "ping":
+        return {"ok": True, "num_docs": len(retriever_manager.all_docs)}
+    if op != "search":
+        return {"error": f"Unknown op '{op}'"}
+
+    k = request.get("k", K_RETRIEVAL)
+    filters = request.get("filters")
+    doc_ids = retriever_manager.metadata_index.filter_doc_ids(**filters) if filters else None
+
+    semantic_ranked, lexical_ranked = [], []
+    if request.get("query_embedding") is not None:
+        semantic_ranked = semantic_search_by_vector(request["query_embedding"], retriever_manager, doc_ids, k)
+    if request.get("lexical"):
+        lexical_ranked = lexical_search(request["query"], retriever_manager, doc_ids, k)
+
+    passages = {}
+    for doc, _ in semantic_ranked + lexical_ranked:
+        key = article_key(doc)
+        if key in retriever_manager.passages_by_article:
+            passages[key] = retriever_manager.passages_by_article[key]
+    return {"semantic": semantic_ranked, "lexical": lexical_ranked, "passages": passages}
+
+def _serve_connection(retriever_manager, connection):
+    try:
+        while True:
+            try:
+                request = connection.recv()
+            except EOFError:
+                break # Coordinator closed the connection
+            try:
+                response = handle_request(retriever_manager, request)
+            except Exception as e:
+                print(f"❌ Error handling shard request: {e}")
+                response = {"error": str(e)}
+            connection.send(response)
+    finally:
+        connection.close()
+
+def serve_shard(shard_dir, address, authkey: bytes, verbose=True, address_pipe=None):
+    """
+    Loads a shard and answers coordinator requests on `address` (host, port) until
+    the process is terminated. Connections are authenticated with `authkey`
+    (multiprocessing.connection HMAC handshake), since requests arrive pickled.
+    Each coordinator connection is served by its own thread. Once listening, the
+    bound address is sent on `address_pipe` if given (port 0 binds a free port).
+    """
+    retriever_manager = load_shard(shard_dir, verbose)
+    with Listener(address, authkey=authkey) as listener:
+        host, port = listener.address[:2]
+        if address_pipe is not None:
+            address_pipe.send((host, port))
+            address_pipe.close()
+        if verbose:
+            print(f"🧩 Shard {shard_dir} serving on {host}:{port}")
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                print(f"⚠️ Warning: Rejected shard connection: {e}")
+                continue
+            threading.Thread(target=_serve_connection, args=(retriever_manager, connection), daemon=True).start()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve one retrieval shard built by `k_base.py --shards N` (requires RAG_SHARD_AUTHKEY).")
+    parser.add_argument("--shard-dir", required=True, help="e.g. db/shards/shard_0")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+
+    authkey = os.environ.get("RAG_SHARD_AUTHKEY")
+    if not authkey:
+        raise SystemExit("❌ RAG_SHARD_AUTHKEY must be set to the secret shared with the coordinator.")
+    serve_shard(args.shard_dir, (args.host, args.port), authkey.encode("utf-8"))
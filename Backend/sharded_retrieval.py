@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import zlib
+import heapq
+import secrets
+import threading
+import multiprocessing
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client
+from rag import assemble_context, K_RETRIEVAL
+from context_builder import CONTEXT_TOKEN_BUDGET
+from metadata_index import split_categories, normalize_value, validate_filters, FILTER_KEYS
+from metrics import timed_stage
+
+# === CONFIG ===
+SHARDS_DIR = os.path.join("db", "shards") # Written by `k_base.py --shards N`
+SHARD_MANIFEST_PATH = os.path.join(SHARDS_DIR, "manifest.json")
+SHARD_CONNECT_TIMEOUT_SECONDS = 300 # Shards may take a while to load their indexes
+SHARD_CONNECT_RETRY_SECONDS = 0.5
+SHARD_BY_OPTIONS = ("hash", "channel")
+
+
+# === PARTITIONING (used by k_base.py) ===
+
+def assign_shard(doc, num_shards, shard_by="hash"):
+    """
+    Shard number for an article Document. "hash" spreads articles evenly by GUID;
+    "channel" keeps each channel's articles together (by its first channel title),
+    so channel-filtered queries mostly touch one shard.
+    """
+    metadata = doc.metadata
+    if shard_by == "channel":
+        channels = split_categories(metadata.get("channel_title", ""))
+        key = normalize_value(channels[0]) if channels else ""
+    else:
+        key = metadata.get("guid") or metadata.get("source", "") or doc.page_content
+    return zlib.crc32(key.encode("utf-8")) % num_shards
+
+def load_shard_manifest(manifest_path=SHARD_MANIFEST_PATH):
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"❌ No shard manifest at {manifest_path}. Run `python k_base.py --shards N` first.")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_shard_manifest(manifest, manifest_path=SHARD_MANIFEST_PATH):
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+# === LOCAL SHARD WORKERS ===
+
+def start_local_shards(shards_dir=SHARDS_DIR, host="127.0.0.1", authkey=None, verbose=True, timeout=SHARD_CONNECT_TIMEOUT_SECONDS):
+    """
+    Starts one shard worker process per shard in the manifest and waits until each
+    one is listening. Workers are spawned (not forked), so they don't inherit the
+    coordinator's embeddings model, and bind an OS-assigned port that they report
+    back, so several coordinators (e.g. serve.py workers) never share shard ports.
+    Returns (addresses, processes, authkey).
+    """
+    from shard_worker import serve_shard
+    manifest = load_shard_manifest(os.path.join(shards_dir, "manifest.json"))
+    authkey = authkey or secrets.token_bytes(32) # Only this coordinator and its children know it
+    context = multiprocessing.get_context("spawn")
+    processes, address_readers = [], []
+    for shard in manifest["shards"]:
+        address_reader, address_writer = context.Pipe(duplex=False)
+        process = context.Process(
+            target=serve_shard,
+            args=(os.path.join(shards_dir, shard["path"]), (host, 0), authkey, verbose, address_writer),
+            daemon=True
+        )
+        process.start()
+        address_writer.close() # The worker holds the only writer, so its exit shows up as EOF
+        processes.append(process)
+        address_readers.append(address_reader)
+
+    addresses = []
+    deadline = time.monotonic() + timeout
+    try:
+        for shard, address_reader in zip(manifest["shards"], address_readers):
+            if not address_reader.poll(max(deadline - time.monotonic(), 0)):
+                raise RuntimeError(f"❌ Shard worker for {shard['path']} did not start listening within {timeout}s.")
+            try:
+                addresses.append(tuple(address_reader.recv()))
+            except EOFError:
+                raise RuntimeError(f"❌ Shard worker for {shard['path']} exited before it started listening.") from None
+    except Exception:
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for address_reader in address_readers:
+            address_reader.close()
+    if verbose:
+        print(f"🚀 Started {len(processes)} local shard workers ({manifest['shard_by']} partitioning).")
+    return addresses, processes, authkey
+
+def parse_shard_addresses(value):
+    """
+    "host1:6100,host2:6100" -> [("host1", 6100), ("host2", 6100)]
+    """
+    addresses = []
+    for item in value.split(","):
+        if item.strip():
+            host, port = item.strip().rsplit(":", 1)
+            addresses.append((host, int(port)))
+    return addresses
+
+
+# === COORDINATOR ===
+
+class ShardedRetriever:
+    """
+    Scatter-gather coordinator over shard workers (shard_worker.py). Each query is
+    embedded once here, fanned out to every shard in parallel, and the per-shard
+    top-k lists are merged into a global top-k per leg before RRF and dedup.
+    Shards share one vocabulary and the corpus-wide BM25 IDF/average length
+    (see k_base.build_shards), so their scores are directly comparable.
+    """
+    def __init__(self, addresses, embeddings_model, authkey: bytes, processes=None):
+        self.addresses = list(addresses)
+        self.embeddings_model = embeddings_model
+        self._authkey = authkey
+        self._processes = processes or [] # Local shard workers to stop on close()
+        self._connections = [None] * len(self.addresses)
+        self._locks = [threading.Lock() for _ in self.addresses] # One request in flight per connection
+        self._pool = ThreadPoolExecutor(max_workers=max(len(self.addresses), 1))
+
+    def _connect(self, shard, timeout=SHARD_CONNECT_TIMEOUT_SECONDS):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return Client(self.addresses[shard], authkey=self._authkey)
+            except (ConnectionRefusedError, FileNotFoundError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(SHARD_CONNECT_RETRY_SECONDS)
+            except multiprocessing.AuthenticationError:
+                raise RuntimeError(
+                    f"❌ Shard {self.addresses[shard]} rejected the authkey: it belongs to another coordinator, "
+                    "or RAG_SHARD_AUTHKEY differs from the one the shard was started with."
+                ) from None
+
+    def _call(self, shard, request):
+        with self._locks[shard]:
+            for attempt in range(2):
+                if self._connections[shard] is None:
+                    self._connections[shard] = self._connect(shard)
+                try:
+                    self._connections[shard].send(request)
+                    response = self._connections[shard].recv()
+                    break
+                except (EOFError, OSError):
+                    # Worker restarted or connection dropped: reconnect once
+                    self._connections[shard] = None
+                    if attempt:
+                        raise
+        if "error" in response:
+            raise RuntimeError(f"Shard {self.addresses[shard]} failed: {response['error']}")
+        return response
+
+    def wait_until_ready(self, verbose=True):
+        """
+        Blocks until every shard answers a ping. Returns the total number of articles.
+        """
+        responses = list(self._pool.map(lambda shard: self._call(shard, {"op": "ping"}), range(len(self.addresses))))
+        total = sum(response["num_docs"] for response in responses)
+        if verbose:
+            print(f"✅ {len(responses)} shards ready ({total} articles).")
+        return total
+
+    def search(self, query, retrieval_strategy="hybrid", filters=None, k=K_RETRIEVAL):
+        """
+        Fans the query out to all shards. Returns (semantic_ranked, lexical_ranked,
+        passages_by_article) merged across shards. A shard that fails is skipped
+        with a warning so the remaining shards still answer.
+        """
+        query_embedding = None
+        if retrieval_strategy in ("semantic", "hybrid"):
+            with timed_stage("query_embedding"):
+                query_embedding = self.embeddings_model.embed_query(query)
+        request = {
+            "op": "search",
+            "query": query,
+            "query_embedding": query_embedding,
+            "lexical": retrieval_strategy in ("lexical", "hybrid"),
+            "filters": filters,
+            "k": k,
+        }
+
+        with timed_stage("shard_fanout"):
+            futures = [self._pool.submit(self._call, shard, request) for shard in range(len(self.addresses))]
+            responses = []
+            for shard, future in enumerate(futures):
+                try:
+                    responses.append(future.result())
+                except Exception as e:
+                    print(f"⚠️ Warning: Shard {self.addresses[shard]} did not answer. Details: {e}")
+        if not responses:
+            raise RuntimeError("❌ No retrieval shard answered the query.")
+
+        with timed_stage("shard_merge"):
+            semantic_ranked = heapq.nlargest(k, chain.from_iterable(r["semantic"] for r in responses), key=lambda item: item[1])
+            lexical_ranked = heapq.nlargest(k, chain.from_iterable(r["lexical"] for r in responses), key=lambda item: item[1])
+            passages_by_article = {}
+            for response in responses:
+                passages_by_article.update(response["passages"])
+        return semantic_ranked, lexical_ranked, passages_by_article
+
+    def close(self):
+        for connection in self._connections:
+            if connection is not None:
+                connection.close()
+        self._pool.shutdown(wait=False)
+        for process in self._processes:
+            process.terminate()
+
+
+def connect_sharded_retriever(embeddings_model=None, verbose=True) -> ShardedRetriever:
+    """
+    Connects to the shard workers listed in RAG_SHARD_ADDRESSES ("host:port,...",
+    authenticated with RAG_SHARD_AUTHKEY), or starts one local worker per shard
+    in db/shards when it is not set. Blocks until every shard is ready.
+    """
+    if embeddings_model is None:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        if verbose:
+            print("Initializing Mixedbread AI Embeddings model (mxbai-embed-large-v1) for the shard coordinator...")
+        embeddings_model = HuggingFaceEmbeddings(model_name="mixedbread-ai/mxbai-embed-large-v1")
+
+    remote_addresses = os.environ.get("RAG_SHARD_ADDRESSES")
+    if remote_addresses:
+        authkey = os.environ.get("RAG_SHARD_AUTHKEY")
+        if not authkey:
+            raise RuntimeError("❌ RAG_SHARD_AUTHKEY must be set when connecting to remote shards (RAG_SHARD_ADDRESSES).")
+        retriever = ShardedRetriever(parse_shard_addresses(remote_addresses), embeddings_model, authkey.encode("utf-8"))
+    else:
+        addresses, processes, authkey = start_local_shards(verbose=verbose)
+        retriever = ShardedRetriever(addresses, embeddings_model, authkey, processes)
+    retriever.wait_until_ready(verbose)
+    return retriever
+
+def retrieve_context_sharded(query: str, sharded_retriever: ShardedRetriever, retrieval_strategy: str = "hybrid", token_budget: int = CONTEXT_TOKEN_BUDGET, return_token_count=False, filters: dict | None = None, verbose=False):
+    """
+    Sharded counterpart of rag.retrieve_context, with the same arguments, filter
+    validation and return value.
+    """
+    if retrieval_strategy not in ("semantic", "lexical", "hybrid"):
+        print(f"WARNING: Unknown retrieval strategy '{retrieval_strategy}'. Defaulting to 'hybrid'.")
+        retrieval_strategy = "hybrid"
+    if filters:
+        # Validated here so a bad filter fails once, not on every shard
+        filters, unknown_keys = validate_filters(filters)
+        if unknown_keys:
+            print(f"WARNING: Ignoring unknown metadata filter keys {unknown_keys}. Supported keys: {', '.join(FILTER_KEYS)}.")
+    if verbose:
+        print(f"Starting sharded RAG context retrieval over {len(sharded_retriever.addresses)} shards for query: '{query}' with strategy: '{retrieval_strategy}'")
+
+    semantic_ranked, lexical_ranked, passages_by_article = sharded_retriever.search(query, retrieval_strategy, filters)
+    if verbose:
+        print(f"    Merged shard results: {len(semantic_ranked)} semantic, {len(lexical_ranked)} lexical.")
+    return assemble_context(
+        query,
+        semantic_ranked,
+        lexical_ranked,
+        sharded_retriever.embeddings_model,
+        passages_by_article,
+        retrieval_strategy=retrieval_strategy,
+        token_budget=token_budget,
+        return_token_count=return_token_count,
+        verbose=verbose
+    )
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from context_builder import article_body, build_article_passages, build_context, split_into_passages
+
+
+def make_doc(description, content, guid="guid-1"):
+    # Same page_content layout as k_base.load_data_into_documents
+    page_content = (
+        "Channel: C\n"
+        "Categories: defi\n"
+        "Title: T\n"
+        f"Description: {description}\n"
+        "Link: l\n"
+        f"Content: {content}"
+    )
+    metadata = {"guid": guid, "title": "T", "channel_title": "C", "source": "l", "original_description": description}
+    return SimpleNamespace(page_content=page_content, metadata=metadata)
+
+
+def test_article_body_keeps_description_and_content_without_scaffolding():
+    doc = make_doc("short desc", "The answer is 42.\nTitle: not a label inside content")
+
+    body = article_body(doc)
+
+    assert body == "short desc\n\nThe answer is 42.\nTitle: not a label inside content"
+    assert "Channel:" not in body and "Link:" not in body
+
+
+def test_article_body_without_scaffolding_uses_page_content():
+    doc = SimpleNamespace(page_content="plain text article", metadata={})
+
+    assert article_body(doc) == "plain text article"
+
+
+def test_context_includes_answer_from_content_field():
+    doc = make_doc("short desc", "The launch date is March 3rd.")
+    passages = build_article_passages([doc])
+
+    context, _ = build_context("launch date", [(doc, 1.0)], passages)
+
+    assert "The launch date is March 3rd." in context
+    assert "short desc" in context
+
+
+def test_run_on_sentence_is_hard_split_to_fit_the_budget():
+    sentence = " ".join(f"word{i}" for i in range(500))
+    doc = make_doc("", sentence)
+
+    passages = split_into_passages(article_body(doc), target_tokens=50)
+
+    assert len(passages) == 10
+    assert all(passage["tokens"] <= 50 for passage in passages)
+    context, tokens_used = build_context("word1", [(doc, 1.0)], {"guid-1": passages}, token_budget=100)
+    assert context
+    assert 0 < tokens_used <= 100
@@ -0,0 +1,90 @@
+import sys
+import time
+
+import pytest
+
+import feeds_new
+from feeds_new import (
+    IndexCommandRunner, next_poll_interval, update_feed_rate,
+    MIN_POLL_INTERVAL, MAX_POLL_INTERVAL, MAX_ERROR_BACKOFF, POLL_JITTER, RATE_SMOOTHING, TARGET_NEW_ITEMS_PER_POLL,
+)
+
+
+def make_state(**overrides):
+    state = {"interval": 1800, "rate_per_hour": 0.0, "consecutive_errors": 0, "last_poll": None}
+    state.update(overrides)
+    return state
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(feeds_new.random, "uniform", lambda low, high: 1.0)
+
+
+def test_first_poll_only_records_the_poll_time():
+    state = make_state(rate_per_hour=0.5)
+
+    update_feed_rate(state, new_count=10, now=1000.0)
+
+    assert state["rate_per_hour"] == 0.5
+    assert state["last_poll"] == 1000.0
+
+
+def test_rate_is_an_ewma_of_observed_rates():
+    state = make_state(rate_per_hour=1.0, last_poll=1000.0)
+
+    update_feed_rate(state, new_count=4, now=1000.0 + 2 * 3600)
+
+    assert state["rate_per_hour"] == pytest.approx(RATE_SMOOTHING * 2.0 + (1 - RATE_SMOOTHING) * 1.0)
+    assert state["last_poll"] == 1000.0 + 2 * 3600
+
+
+def test_interval_targets_items_per_poll(no_jitter):
+    state = make_state(rate_per_hour=2.0)
+
+    assert next_poll_interval(state) == pytest.approx(TARGET_NEW_ITEMS_PER_POLL / 2.0 * 3600)
+
+
+def test_interval_is_clamped(no_jitter):
+    assert next_poll_interval(make_state(rate_per_hour=1000.0)) == MIN_POLL_INTERVAL
+    assert next_poll_interval(make_state(rate_per_hour=0.001)) == MAX_POLL_INTERVAL
+    assert next_poll_interval(make_state(interval=MAX_POLL_INTERVAL)) == MAX_POLL_INTERVAL
+
+
+def test_quiet_feed_backs_off_gradually(no_jitter):
+    assert next_poll_interval(make_state(interval=1800)) == 2700
+
+
+def test_errors_back_off_exponentially_up_to_the_cap(no_jitter):
+    assert next_poll_interval(make_state(rate_per_hour=100.0, consecutive_errors=1)) == MIN_POLL_INTERVAL * 2
+    assert next_poll_interval(make_state(consecutive_errors=3)) == MIN_POLL_INTERVAL * 8
+    assert next_poll_interval(make_state(consecutive_errors=20)) == MAX_ERROR_BACKOFF
+
+
+def test_jitter_stays_within_bounds():
+    intervals = [next_poll_interval(make_state(rate_per_hour=2.0)) for _ in range(200)]
+    base = TARGET_NEW_ITEMS_PER_POLL / 2.0 * 3600
+
+    assert all(base * (1 - POLL_JITTER) <= interval <= base * (1 + POLL_JITTER) for interval in intervals)
+
+
+def test_index_command_runs_in_the_background_one_at_a_time(tmp_path):
+    log_path = tmp_path / "runs.log"
+    command = f'"{sys.executable}" -c "import time; time.sleep(0.3); open(r\'{log_path}\', \'a\').write(\'run\\n\')"'
+    runner = IndexCommandRunner(command)
+
+    started = time.monotonic()
+    runner.request()
+    first_process = runner.process
+    runner.request() # Arrives while the first run is still going
+    assert time.monotonic() - started < 0.3 # Neither call waited for the command
+    assert runner.process is first_process and runner.pending
+
+    first_process.wait()
+    runner.poll() # Next scheduler tick starts the pending run
+    assert runner.process is not first_process and not runner.pending
+    runner.process.wait()
+    runner.poll()
+
+    assert runner.process is None
+    assert log_path.read_text().splitlines() == ["run", "run"]
@@ -0,0 +1,132 @@
+import io
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import feedparser
+import pytest
+
+import feed_stream
+import feeds_new
+from feed_stream import UnorderedFeedError, iter_feed_entries, read_new_entries
+
+
+def rss_feed(guids, newest_first=True):
+    step = timedelta(hours=-1 if newest_first else 1)
+    start = datetime(2025, 6, 10, tzinfo=timezone.utc)
+    items = "".join(
+        f"<item><title>Item {guid}</title><link>https://example.com/{guid}</link>"
+        f"<guid>https://example.com/{guid}</guid><pubDate>{format_datetime(start + i * step, usegmt=True)}</pubDate>"
+        f"<description>About {guid}</description><category>news</category></item>"
+        for i, guid in enumerate(guids)
+    )
+    return f"<rss version='2.0'><channel><title>Test Channel</title>{items}</channel></rss>".encode("utf-8")
+
+
+ATOM_FEED = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>Atom Channel</title>
+  <entry>
+    <title>Long id</title>
+    <link rel="alternate" href="https://example.com/atom-1"/>
+    <link rel="enclosure" href="https://example.com/atom-1.mp3"/>
+    <id>urn:uuid:1225c695-cfb8-4ebb-aaaa-80da344efa6a</id>
+    <published>2025-06-10T10:00:00Z</published>
+    <summary>First entry</summary>
+    <category term="defi"/>
+  </entry>
+  <entry>
+    <title>Short id</title>
+    <link href="https://example.com/atom-2"/>
+    <id>2</id>
+    <published>2025-06-09T10:00:00Z</published>
+    <summary>Second entry</summary>
+  </entry>
+</feed>
+"""
+
+
+class FakeResponse(io.BytesIO):
+    """
+    urlopen() result over an in-memory feed that counts how many bytes were read.
+    """
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def serve_feed(monkeypatch, data):
+    responses = []
+
+    def fake_urlopen(request, timeout=None):
+        responses.append(FakeResponse(data))
+        return responses[-1]
+
+    monkeypatch.setattr(feed_stream.urllib.request, "urlopen", fake_urlopen)
+    return responses
+
+
+def test_reading_stops_after_seen_run_limit(monkeypatch):
+    guids = [f"item-{i}" for i in range(2000)]
+    data = rss_feed(guids)
+    responses = serve_feed(monkeypatch, data)
+    seen = {f"https://example.com/{guid}" for guid in guids[3:]}
+
+    channel_title, new_entries, items_read = read_new_entries("https://feed", seen, feeds_new.get_article_id, seen_run_limit=5)
+
+    assert channel_title == "Test Channel"
+    assert [entry["guid"] for entry in new_entries] == [f"https://example.com/item-{i}" for i in range(3)]
+    assert items_read == 3 + 5
+    assert responses[0].bytes_read < len(data) // 2 # The rest of the download was never read
+
+
+def test_seen_items_interleaved_with_new_ones_do_not_stop_reading(monkeypatch):
+    guids = [f"item-{i}" for i in range(10)]
+    serve_feed(monkeypatch, rss_feed(guids))
+    seen = {"https://example.com/item-1", "https://example.com/item-3"}
+
+    _, new_entries, items_read = read_new_entries("https://feed", seen, feeds_new.get_article_id, seen_run_limit=2)
+
+    assert items_read == 10
+    assert len(new_entries) == 8
+
+
+def test_oldest_first_feed_raises(monkeypatch):
+    serve_feed(monkeypatch, rss_feed(["a", "b", "c"], newest_first=False))
+
+    with pytest.raises(UnorderedFeedError):
+        read_new_entries("https://feed", set(), feeds_new.get_article_id)
+
+
+def test_fetch_new_entries_falls_back_to_feedparser_for_oldest_first_feeds(monkeypatch):
+    data = rss_feed(["a", "b", "c"], newest_first=False)
+    serve_feed(monkeypatch, data)
+    parsed_urls = []
+    real_parse = feedparser.parse
+
+    def fake_parse(url):
+        parsed_urls.append(url)
+        return real_parse(data)
+
+    monkeypatch.setattr(feeds_new.feedparser, "parse", fake_parse)
+
+    channel_title, entries = feeds_new.fetch_new_entries("https://feed", set())
+
+    assert parsed_urls == ["https://feed"]
+    assert channel_title == "Test Channel"
+    assert [entry["link"] for entry in entries] == ["https://example.com/a", "https://example.com/b", "https://example.com/c"]
+
+
+def test_atom_entries_get_the_same_article_ids_as_feedparser():
+    feed_info = {}
+    streamed = list(iter_feed_entries(io.BytesIO(ATOM_FEED), feed_info))
+    parsed = feedparser.parse(ATOM_FEED).entries
+
+    assert feed_info["title"] == "Atom Channel"
+    assert [entry["link"] for entry in streamed] == ["https://example.com/atom-1", "https://example.com/atom-2"]
+    assert streamed[0]["tags"] == [{"term": "defi"}]
+    assert [feeds_new.get_article_id(entry) for entry in streamed] == [feeds_new.get_article_id(entry) for entry in parsed]
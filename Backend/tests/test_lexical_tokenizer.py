@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from lexical_tokenizer import LexicalTokenizer, PARALLEL_MIN_DOCS
+
+
+def make_corpus(num_docs, seed=5):
+    rng = random.Random(seed)
+    words = ["Solana", "validators", "the", "staking", "rewards", "Ethereum's", "roll-ups", "v2.1", "grants", "Café", "and", "of"]
+    words += [f"term{i}" for i in range(300)]
+    return [" ".join(rng.choices(words, k=rng.randint(5, 40))) for _ in range(num_docs)]
+
+
+def test_parallel_and_serial_encoding_are_identical():
+    corpus = make_corpus(PARALLEL_MIN_DOCS + 500)
+    serial, parallel = LexicalTokenizer(), LexicalTokenizer()
+
+    serial_ids = serial.encode_corpus(corpus, workers=1)
+    parallel_ids = parallel.encode_corpus(corpus, workers=4)
+
+    assert parallel_ids == serial_ids
+    assert parallel.vocabulary == serial.vocabulary
+    assert all(isinstance(term_id, int) for doc in parallel_ids[:10] for term_id in doc)
+
+
+def test_encode_query_drops_terms_outside_the_vocabulary():
+    tokenizer = LexicalTokenizer()
+    tokenizer.encode_corpus(["Solana staking rewards"])
+
+    assert tokenizer.encode_query("solana unknownterm REWARDS") == [tokenizer.vocabulary["solana"], tokenizer.vocabulary["rewards"]]
+    assert tokenizer.encode_query("completely unseen words") == []
+
+
+def test_stopwords_are_removed_at_index_and_query_time():
+    tokenizer = LexicalTokenizer()
+    tokenizer.encode_corpus(["The state of the validators"])
+
+    assert "the" not in tokenizer.vocabulary and "of" not in tokenizer.vocabulary
+    assert tokenizer.encode_query("the validators") == [tokenizer.vocabulary["validators"]]
+
+    keep_stopwords = LexicalTokenizer(remove_stopwords=False)
+    keep_stopwords.encode_corpus(["The state of the validators"])
+    assert "the" in keep_stopwords.vocabulary
+    assert keep_stopwords.encode_query("the") == [keep_stopwords.vocabulary["the"]]
+
+
+def test_stemming_is_applied_at_index_and_query_time():
+    pytest.importorskip("nltk")
+    tokenizer = LexicalTokenizer(stem=True)
+    tokenizer.encode_corpus(["Validators are staking rewards"])
+
+    assert "validators" not in tokenizer.vocabulary
+    # A different inflection in the query still hits the stemmed corpus terms
+    assert tokenizer.encode_query("validator staked reward") == [
+        tokenizer.vocabulary["valid"], tokenizer.vocabulary["stake"], tokenizer.vocabulary["reward"],
+    ]
+    unstemmed = LexicalTokenizer()
+    unstemmed.encode_corpus(["Validators are staking rewards"])
+    assert unstemmed.encode_query("validator staked reward") == []
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import pytest
+
+from metadata_index import MetadataIndex, validate_filters
+
+
+def make_index():
+    docs = [
+        SimpleNamespace(metadata={"channel_title": "Solana", "categories": "defi", "publication_date": "Tue, 10 Jun 2025 14:00:00 GMT"}),
+        SimpleNamespace(metadata={"channel_title": "Ethereum", "categories": "grants", "publication_date": "2025-06-20"}),
+    ]
+    return MetadataIndex.from_documents(docs)
+
+
+def test_date_bounds_filter_documents():
+    index = make_index()
+
+    assert index.filter_doc_ids(since="2025-06-15").tolist() == [1]
+    assert index.filter_doc_ids(until="2025-06-15").tolist() == [0]
+
+
+def test_single_string_channel_or_category_is_one_value():
+    index = make_index()
+
+    assert index.filter_doc_ids(channels="Solana").tolist() == [0]
+    assert index.filter_doc_ids(channels="solana", categories="defi").tolist() == [0]
+    assert index.filter_doc_ids(categories="grants").tolist() == [1]
+
+
+def test_unparseable_date_bound_raises():
+    index = make_index()
+
+    with pytest.raises(ValueError):
+        index.filter_doc_ids(since="this week")
+
+
+def test_validate_filters_reports_unknown_keys():
+    known, unknown = validate_filters({"channel": ["Solana"], "categories": ["defi"]})
+
+    assert known == {"categories": ["defi"]}
+    assert unknown == ["channel"]
+    with pytest.raises(ValueError):
+        validate_filters({"until": "yesterday"})
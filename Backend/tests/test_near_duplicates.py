@@ -0,0 +1,103 @@
+import feeds_new
+from near_duplicates import NearDuplicateIndex, collapse_near_duplicates
+
+STORY = (
+    "Solana validators approved a fee market change that lowers priority fees "
+    "for small transactions and routes more of the burn to stakers over the next epochs."
+)
+
+
+def make_article(guid, channel, description=STORY, title="Fee market update", categories="defi"):
+    return {
+        "guid": guid,
+        "link": f"https://example.com/{guid}",
+        "channel_title": channel,
+        "title": title,
+        "description": description,
+        "categories": categories,
+        "publication_date": "2025-06-10",
+    }
+
+
+def test_syndicated_copies_collapse_and_merge_channels_and_categories():
+    index = NearDuplicateIndex()
+    articles = [
+        make_article("a", "Solana", categories="defi"),
+        make_article("b", "Near", description=STORY + " Reposted.", categories="defi, fees"),
+    ]
+
+    canonical, updated_existing = collapse_near_duplicates(articles, index)
+
+    assert [article["guid"] for article in canonical] == ["a"]
+    assert canonical[0]["channel_title"] == "Solana, Near"
+    assert canonical[0]["categories"] == "defi, fees"
+    assert updated_existing == {}
+    assert index.articles["a"]["aliases"] == ["b"]
+
+
+def test_copy_of_earlier_run_article_updates_it_by_link():
+    index = NearDuplicateIndex()
+    collapse_near_duplicates([make_article("a", "Solana")], index)
+
+    canonical, updated_existing = collapse_near_duplicates([make_article("b", "Sui")], index)
+
+    assert canonical == []
+    assert updated_existing == {"https://example.com/a": ("Solana, Sui", "defi")}
+
+
+def test_distinct_short_posts_are_not_collapsed():
+    index = NearDuplicateIndex()
+    articles = [
+        make_article("gm-sui", "Sui", title="GM", description=""),
+        make_article("gm-near", "Near", title="GM", description=""),
+        make_article("untitled-1", "Solana", title="Untitled Item", description=""),
+        make_article("untitled-2", "Eigen", title="Untitled Item", description=""),
+    ]
+
+    canonical, _ = collapse_near_duplicates(articles, index)
+
+    assert [article["guid"] for article in canonical] == ["gm-sui", "gm-near", "untitled-1", "untitled-2"]
+
+
+def test_refetched_article_is_not_a_duplicate_of_itself():
+    index = NearDuplicateIndex()
+    collapse_near_duplicates([make_article("a", "Solana")], index)
+
+    # Index saved but the article never reached the text file: the next run refetches it
+    canonical, _ = collapse_near_duplicates([make_article("a", "Solana")], index)
+
+    assert [article["guid"] for article in canonical] == ["a"]
+    assert list(index.articles) == ["a"]
+
+
+def test_index_round_trips_through_save_and_load(tmp_path):
+    filepath = str(tmp_path / "near_duplicate_index.json")
+    index = NearDuplicateIndex()
+    collapse_near_duplicates([make_article("a", "Solana"), make_article("b", "Near")], index)
+
+    index.save(filepath)
+    loaded = NearDuplicateIndex.load(filepath)
+
+    assert loaded.articles["a"]["channels"] == ["Solana", "Near"]
+    assert loaded.articles["a"]["aliases"] == ["b"]
+    assert (loaded.articles["a"]["signature"] == index.articles["a"]["signature"]).all()
+    canonical, updated_existing = collapse_near_duplicates([make_article("c", "Sui")], loaded)
+    assert canonical == []
+    assert updated_existing == {"https://example.com/a": ("Solana, Near, Sui", "defi")}
+
+
+def test_update_articles_in_txt_rewrites_only_the_matching_block(tmp_path):
+    filepath = str(tmp_path / "all_new_articles.txt")
+    first = make_article("a", "Solana", description="line one\nline two")
+    second = make_article("b", "Ethereum", title="Other story", categories="grants")
+    feeds_new.save_articles_to_txt([first, second], filepath)
+
+    feeds_new.update_articles_in_txt(filepath, {"https://example.com/b": ("Ethereum, Near", "grants, fees")})
+
+    with open(filepath, "r", encoding="utf-8") as f:
+        text = f.read()
+    assert "channel_title: Solana,\n" in text
+    assert "categories: defi\n" in text
+    assert "channel_title: Ethereum, Near,\n" in text
+    assert "categories: grants, fees\n" in text
+    assert "description: line one\n line two,\n" in text
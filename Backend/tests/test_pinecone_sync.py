@@ -0,0 +1,241 @@
+import threading
+
+import numpy as np
+import pytest
+
+import pinecone_sync
+from pinecone_sync import (
+    append_dead_letter, compute_article_hash, delete_from_pinecone, load_dead_letter_ids, load_sync_manifest,
+    plan_delta_sync, prune_dead_letter, run_delta_sync, save_sync_manifest, upsert_to_pinecone,
+)
+
+
+class FakeIndex:
+    """
+    In-memory stand-in for a Pinecone Index: records every upsert/delete call.
+    """
+    def __init__(self, fail_delete_ids=(), fail_upserts=0, upsert_seconds=0.0):
+        self.vectors = {}
+        self.upserted = []
+        self.deleted = []
+        self.fail_delete_ids = set(fail_delete_ids)
+        self.fail_upserts = fail_upserts # The first N upsert calls raise
+        self.upsert_seconds = upsert_seconds
+        self.upsert_calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors):
+        with self._lock:
+            self.upsert_calls += 1
+            if self.upsert_calls <= self.fail_upserts:
+                raise RuntimeError("injected upsert failure")
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        threading.Event().wait(self.upsert_seconds) # Not time.sleep, which the retry tests patch out
+        with self._lock:
+            self.in_flight -= 1
+        for vector_id, values, metadata in vectors:
+            self.vectors[vector_id] = (values, metadata)
+            self.upserted.append(vector_id)
+
+    def delete(self, ids):
+        if self.fail_delete_ids & set(ids):
+            raise RuntimeError("injected delete failure")
+        for vector_id in ids:
+            self.vectors.pop(vector_id, None)
+            self.deleted.append(vector_id)
+
+
+def make_article(guid, description="desc"):
+    return {"guid": guid, "link": guid, "title": f"Title {guid}", "channel_title": "C",
+            "publication_date": "2025-06-01", "description": description, "categories": "news"}
+
+
+def encode(texts):
+    return np.zeros((len(texts), 4), dtype=np.float32)
+
+
+def sync(index, articles, manifest, dead_letter_path="unused-dead-letter.jsonl", batch_size=2):
+    """
+    One run of pinecone-rag.py's sync against the fake index. Returns the articles
+    handed to the upsert step.
+    """
+    handed_over = []
+
+    def upsert_fn(changed_articles):
+        handed_over.extend(changed_articles)
+        return upsert_to_pinecone(index, changed_articles, encode, batch_size, dead_letter_path)
+
+    run_delta_sync(index, articles, manifest, upsert_fn, batch_size, dead_letter_path)
+    return handed_over
+
+
+def test_first_sync_upserts_every_article():
+    index = FakeIndex()
+    manifest = load_sync_manifest("does-not-exist.json")
+
+    changed = sync(index, [make_article("a"), make_article("b")], manifest)
+
+    assert [article["guid"] for article in changed] == ["a", "b"]
+    assert index.deleted == []
+    assert manifest["version"] == 1
+    assert set(manifest["articles"]) == {"a", "b"}
+
+
+def test_delta_sync_handles_new_changed_unchanged_and_removed():
+    index = FakeIndex()
+    manifest = {"version": 0, "articles": {}}
+    sync(index, [make_article("unchanged"), make_article("changed"), make_article("removed")], manifest)
+    index.upserted.clear()
+
+    articles = [make_article("unchanged"), make_article("changed", description="edited"), make_article("new")]
+    changed = sync(index, articles, manifest)
+
+    assert sorted(article["guid"] for article in changed) == ["changed", "new"]
+    assert sorted(index.upserted) == ["changed", "new"]
+    assert index.deleted == ["removed"]
+    assert set(index.vectors) == {"unchanged", "changed", "new"}
+    assert manifest["version"] == 2
+    assert manifest["articles"]["unchanged"]["version"] == 1
+    assert manifest["articles"]["changed"] == {"hash": compute_article_hash(articles[1]), "version": 2}
+    assert "removed" not in manifest["articles"]
+
+
+def test_failed_delete_stays_in_manifest_for_retry():
+    index = FakeIndex(fail_delete_ids={"gone"})
+    manifest = {"version": 0, "articles": {}}
+    sync(index, [make_article("kept"), make_article("gone")], manifest)
+
+    sync(index, [make_article("kept")], manifest)
+
+    assert index.deleted == []
+    assert "gone" in manifest["articles"]
+    assert plan_delta_sync([make_article("kept")], manifest)[1] == ["gone"]
+
+
+def test_manifest_round_trip(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = {"version": 0, "articles": {}}
+    sync(FakeIndex(), [make_article("a")], manifest)
+
+    save_sync_manifest(path, manifest)
+
+    assert load_sync_manifest(path) == manifest
+    assert plan_delta_sync([make_article("a")], load_sync_manifest(path))[0] == []
+
+
+def test_unreadable_manifest_starts_a_full_sync(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text("{not json", encoding="utf-8")
+
+    assert load_sync_manifest(str(path)) == {"version": 0, "articles": {}}
+
+
+def test_dead_letter_is_pruned_only_to_unresolved_ids(tmp_path):
+    path = str(tmp_path / "dead_letter.jsonl")
+    append_dead_letter(path, ["a", "b"], "timeout")
+    append_dead_letter(path, ["c"], "timeout")
+    append_dead_letter(path, ["b"], "timeout again") # "b" failed again during the replay
+
+    prune_dead_letter(path, resolved_ids={"a"}, current_ids={"a", "b"})
+
+    assert load_dead_letter_ids(path) == {"b"}
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1 and "timeout again" in lines[0]
+
+
+def test_dead_letter_file_removed_once_everything_is_resolved(tmp_path):
+    path = str(tmp_path / "dead_letter.jsonl")
+    append_dead_letter(path, ["a"], "timeout")
+
+    prune_dead_letter(path, resolved_ids={"a"}, current_ids={"a"})
+
+    assert not (tmp_path / "dead_letter.jsonl").exists()
+
+
+def test_batch_succeeds_after_retries(tmp_path, monkeypatch):
+    delays = []
+    monkeypatch.setattr(pinecone_sync.time, "sleep", delays.append)
+    dead_letter_path = str(tmp_path / "dead_letter.jsonl")
+    index = FakeIndex(fail_upserts=2)
+
+    upserted_ids = upsert_to_pinecone(index, [make_article("a"), make_article("b")], encode, 10, dead_letter_path, max_retries=3)
+
+    assert upserted_ids == ["a", "b"]
+    assert index.upsert_calls == 3
+    assert len(delays) == 2 and delays[1] > delays[0] # Exponential backoff
+    assert not (tmp_path / "dead_letter.jsonl").exists()
+
+
+def test_batch_goes_to_dead_letter_after_max_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(pinecone_sync.time, "sleep", lambda seconds: None)
+    dead_letter_path = str(tmp_path / "dead_letter.jsonl")
+    index = FakeIndex(fail_upserts=100)
+
+    upserted_ids = upsert_to_pinecone(index, [make_article("a"), make_article("b")], encode, 10, dead_letter_path, max_retries=2)
+
+    assert upserted_ids == []
+    assert index.upsert_calls == 3
+    assert load_dead_letter_ids(dead_letter_path) == {"a", "b"}
+
+
+def test_no_more_than_max_inflight_batches_are_in_flight(tmp_path):
+    index = FakeIndex(upsert_seconds=0.02)
+    articles = [make_article(str(i)) for i in range(40)]
+
+    upserted_ids = upsert_to_pinecone(index, articles, encode, 2, str(tmp_path / "dead_letter.jsonl"), max_inflight=3)
+
+    assert sorted(upserted_ids) == sorted(article["guid"] for article in articles)
+    assert 1 < index.max_in_flight <= 3
+
+
+def test_nothing_to_sync_leaves_manifest_and_prunes_vanished_dead_letter_ids(tmp_path):
+    dead_letter_path = str(tmp_path / "dead_letter.jsonl")
+    index = FakeIndex()
+    manifest = {"version": 0, "articles": {}}
+    sync(index, [make_article("a")], manifest, dead_letter_path)
+    append_dead_letter(dead_letter_path, ["vanished"], "timeout")
+
+    handed_over = []
+    assert run_delta_sync(index, [make_article("a")], manifest, handed_over.extend, 2, dead_letter_path) is False
+
+    assert handed_over == []
+    assert manifest["version"] == 1
+    assert not (tmp_path / "dead_letter.jsonl").exists()
+
+
+def test_dead_letter_ids_are_replayed_then_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(pinecone_sync.time, "sleep", lambda seconds: None)
+    dead_letter_path = str(tmp_path / "dead_letter.jsonl")
+    manifest = {"version": 0, "articles": {}}
+    # First run: every upsert fails, so nothing reaches the manifest and both IDs are dead-lettered
+    sync(FakeIndex(fail_upserts=100), [make_article("a"), make_article("b")], manifest, dead_letter_path)
+    assert manifest["articles"] == {} and load_dead_letter_ids(dead_letter_path) == {"a", "b"}
+    # Someone records "b" in the manifest anyway: it is still replayed from the dead-letter file
+    manifest["articles"]["b"] = {"hash": compute_article_hash(make_article("b")), "version": 1}
+
+    index = FakeIndex()
+    changed = sync(index, [make_article("a"), make_article("b")], manifest, dead_letter_path)
+
+    assert sorted(article["guid"] for article in changed) == ["a", "b"]
+    assert set(index.vectors) == {"a", "b"}
+    assert set(manifest["articles"]) == {"a", "b"}
+    assert not (tmp_path / "dead_letter.jsonl").exists()
+
+
+def test_dead_letter_file_survives_a_failed_replay(tmp_path):
+    dead_letter_path = str(tmp_path / "dead_letter.jsonl")
+    append_dead_letter(dead_letter_path, ["a"], "timeout")
+    manifest = {"version": 0, "articles": {}}
+
+    def crashing_upsert(changed_articles):
+        raise RuntimeError("model failed to load")
+
+    with pytest.raises(RuntimeError):
+        run_delta_sync(FakeIndex(), [make_article("a")], manifest, crashing_upsert, 2, dead_letter_path)
+
+    assert load_dead_letter_ids(dead_letter_path) == {"a"}
+    assert manifest == {"version": 0, "articles": {}}
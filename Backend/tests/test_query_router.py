@@ -0,0 +1,25 @@
+import pytest
+
+from query_router import MODE_DIRECT, MODE_REACT, route_query
+
+
+@pytest.mark.parametrize("query", [
+    "hi",
+    "Hey there!",
+    "thanks a lot :)",
+    "What is Curate.Fun?",
+    "Latest Solana news?",
+])
+def test_simple_queries_get_direct_answers(query):
+    assert route_query(query)[0] == MODE_DIRECT
+
+
+@pytest.mark.parametrize("query", [
+    "hi, can you compare Solana vs Ethereum grants in detail and explain why?",
+    "thanks! why did ETH drop?",
+    "What is Curate.Fun and how does it compare to other curation tools?",
+    "What changed this week? And which grants were announced?",
+    "hey, give me a summary of every grant, hackathon and funding round announced across all the ecosystems this month",
+])
+def test_complex_queries_keep_reasoning_prompt(query):
+    assert route_query(query)[0] == MODE_REACT
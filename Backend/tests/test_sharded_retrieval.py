@@ -0,0 +1,78 @@
+import pytest
+
+from benchmark_retrieval import HashingEmbeddings, build_indexes, generate_queries
+from k_base import build_shards
+from rag import lexical_search, semantic_search
+from sharded_retrieval import ShardedRetriever, start_local_shards
+
+NUM_ARTICLES = 400
+NUM_QUERIES = 30
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    manager, articles, _ = build_indexes(NUM_ARTICLES, seed=3, verbose=False)
+    shards_dir = str(tmp_path_factory.mktemp("shards"))
+    build_shards(manager.all_docs, manager.embeddings_model, 3, shard_by="channel", verbose=False, shards_dir=shards_dir)
+    return manager, articles, shards_dir
+
+
+@pytest.fixture(scope="module")
+def sharded_retriever(corpus):
+    _, _, shards_dir = corpus
+    addresses, processes, authkey = start_local_shards(shards_dir, verbose=False)
+    retriever = ShardedRetriever(addresses, HashingEmbeddings(), authkey, processes)
+    retriever.wait_until_ready(verbose=False)
+    yield retriever
+    retriever.close()
+
+
+def same_top_k(sharded, unsharded):
+    """
+    Same scores in the same order, and the same articles above the k-th score.
+    Articles tied at exactly the k-th score may legitimately differ.
+    """
+    sharded_scores = [score for _, score in sharded]
+    if sharded_scores != pytest.approx([score for _, score in unsharded]):
+        return False
+    cutoff = sharded_scores[-1] if sharded_scores else None
+
+    def above_cutoff(ranked):
+        return {doc.metadata["guid"] for doc, score in ranked if score != pytest.approx(cutoff)}
+
+    return above_cutoff(sharded) == above_cutoff(unsharded)
+
+
+def test_sharded_top_k_matches_unsharded(corpus, sharded_retriever):
+    manager, articles, _ = corpus
+    mismatches = []
+    for query in generate_queries(articles, NUM_QUERIES):
+        for filters in (None, {"channels": [articles[0]["channel_title"]]}):
+            doc_ids = manager.metadata_index.filter_doc_ids(**filters) if filters else None
+            semantic_ranked, lexical_ranked, _ = sharded_retriever.search(query, "hybrid", filters)
+            if not same_top_k(semantic_ranked, semantic_search(query, manager, doc_ids)):
+                mismatches.append(("semantic", query, filters))
+            if not same_top_k(lexical_ranked, lexical_search(query, manager, doc_ids)):
+                mismatches.append(("lexical", query, filters))
+
+    assert mismatches == []
+
+
+def test_two_coordinators_get_their_own_shard_ports(corpus, sharded_retriever):
+    _, _, shards_dir = corpus
+    addresses, processes, authkey = start_local_shards(shards_dir, verbose=False)
+    second = ShardedRetriever(addresses, HashingEmbeddings(), authkey, processes)
+    try:
+        assert not set(addresses) & set(sharded_retriever.addresses)
+        assert second.wait_until_ready(verbose=False) == NUM_ARTICLES
+    finally:
+        second.close()
+
+
+def test_wrong_authkey_fails_with_a_clear_error(sharded_retriever):
+    intruder = ShardedRetriever(sharded_retriever.addresses[:1], HashingEmbeddings(), b"not the shard's key")
+    try:
+        with pytest.raises(RuntimeError, match="rejected the authkey"):
+            intruder.wait_until_ready(verbose=False)
+    finally:
+        intruder.close()